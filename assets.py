@@ -1,12 +1,17 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+import argparse
+import contextlib
+import io
 import json
+import multiprocessing
 import os
-import sys
 import shutil
-from subprocess import call
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
 
+from PIL import Image
 from PyTexturePacker import ImageRect
 from PyTexturePacker import Packer
 from PyTexturePacker import Utils as PyTexturePackerUtils
@@ -16,12 +21,88 @@ from build_scripts.MulleResource import MulleResource
 from build_scripts.convert_image import convert_image
 from build_scripts.data import director_data
 from build_scripts.parse_animation_chart import parse_animation_chart
-
-optimizeImages = int(sys.argv[1])
+from build_scripts import asset_manifest
+from build_scripts import audio_streams
+from build_scripts import audio_trim
+from build_scripts import compact_meta
+from build_scripts import hashed_names
+from build_scripts import atlas_planner
+from build_scripts import image_formats
+from build_scripts import member_index
+from build_scripts import page_groups
+from build_scripts import palette_variants
+from build_scripts import png8
+from build_scripts import png_optimize
+from build_scripts import progressive
+from build_scripts import shared_atlas
+from build_scripts import shared_audio
+from build_scripts import tile_dedupe
+
+argParser = argparse.ArgumentParser(description='Convert extracted Director casts into Phaser asset packs')
+argParser.add_argument('optimize', type=int,
+                       help='atlas PNG optimization: 0 to skip, 1-3 for the fast search, 4-7 for the max search')
+argParser.add_argument('out', nargs='?', default=None, help='output folder (default: ./dist/assets)')
+argParser.add_argument('--only', default=None,
+                       help='comma separated resource names to rebuild, other resources are left as they are')
+argParser.add_argument('--force', action='store_true', help='rebuild resources even if their inputs did not change')
+argParser.add_argument('--jobs', type=int, default=os.cpu_count() or 1, help='number of resources built in parallel')
+argParser.add_argument('--max-memory', type=int, default=4096,
+                       help='estimated memory in MB that resources built in parallel may use together')
+argParser.add_argument('--stream-audio', type=float, default=0, metavar='SECONDS',
+                       help='write clips longer than this as separate files decoded on first play, not in the sprite')
+argParser.add_argument('--audio-layout', choices=['fixed', 'tight'], default='fixed',
+                       help='silence between sprite clips: fixed 1 s, or tight guard gaps for the output codecs')
+argParser.add_argument('--trim-audio', action='store_true',
+                       help='cut leading and trailing silence of clips that do not loop, write .build/audio-report.json')
+argParser.add_argument('--normalize-audio', action='store_true',
+                       help='resample clips once to the encoder rate in the build instead of in pydub and ffmpeg')
+argParser.add_argument('--audio-cache', default=os.path.join('.cache', 'audio'),
+                       help='directory for encoded audio sprites reused across builds, empty to disable')
+argParser.add_argument('--png-cache', default=os.path.join('.cache', 'png'),
+                       help='folder with optimized atlas pages from earlier builds')
+argParser.add_argument('--image-formats', default='webp',
+                       help='comma separated formats written next to each atlas PNG (webp, avif), empty for PNG only')
+argParser.add_argument('--atlas-plan', action='store_true',
+                       help='pick the atlas page size per resource that needs the fewest texels, '
+                            'pages may then be non power of two')
+argParser.add_argument('--atlas-max-size', type=int, default=2048, help='largest atlas page width and height')
+argParser.add_argument('--atlas-max-pages', type=int, default=None,
+                       help='with --atlas-plan, prefer page sizes that give at most this many pages per resource '
+                            '(default: as many as plain --atlas-max-size pages)')
+argParser.add_argument('--png8', action='store_true',
+                       help='write atlas pages with at most 256 visible colors as palette PNGs')
+argParser.add_argument('--progressive', action='store_true',
+                       help='move marker dialog audio and backgrounds the score does not show into deferred packs')
+argParser.add_argument('--hash-names', action='store_true',
+                       help='point the packs at content-hashed copies of their files and write manifest.json')
+argParser.add_argument('--palette-report', action='store_true',
+                       help='report members that only differ by palette and what storing them once would save')
+argParser.add_argument('--tile-report', type=int, default=None, metavar='SIZE',
+                       help='report the atlas area each resource would save with frames stored as unique SIZE tiles')
+argParser.add_argument('--group-pages', action='store_true',
+                       help='pack sprites of the same animation action or scene onto the same atlas page, '
+                            'not with --atlas-plan')
+argParser.add_argument('--backgrounds', action='store_true',
+                       help='write large opaque members as standalone lossy images instead of packing them')
+argParser.add_argument('--background-quality', type=int, default=85, help='quality of standalone backgrounds')
+argParser.add_argument('--background-min-pixels', type=int, default=640 * 400,
+                       help='smallest opaque member, in pixels, written as a standalone background')
+args = argParser.parse_args()
+if args.group_pages and args.atlas_plan:
+    argParser.error('--group-pages cannot be combined with --atlas-plan')
+
+optimizeImages = args.optimize
+pngMode = None
+if optimizeImages > 0:
+    pngMode = 'fast' if optimizeImages <= 3 else 'max'
 strict_missing_members = os.getenv('MULLE_ASSETS_STRICT', '0') == '1'
 # Include all members for each referenced cast file to maximize Lingo parity.
 # Set MULLE_ASSETS_ALL=0 to keep the original range-limited behavior.
 include_all_members = os.getenv('MULLE_ASSETS_ALL', '1') == '1'
+# Pack sprites used by several resources into one shared atlas per game.
+share_atlas = os.getenv('MULLE_ASSETS_SHARED_ATLAS', '0') == '1'
+# Encode clips used by several resources once, in the same shared pack.
+share_audio = os.getenv('MULLE_ASSETS_SHARED_AUDIO', '0') == '1'
 
 MulleResources = []
 
@@ -524,10 +605,10 @@ else:
 
 # ============================================================================
 
-if len(sys.argv) < 3 or not sys.argv[2]:
+if not args.out:
     assetOutPath = "./dist/assets"
 else:
-    assetOutPath = sys.argv[2]
+    assetOutPath = args.out
 
 if not os.path.exists(assetOutPath):
     os.makedirs(assetOutPath)
@@ -557,26 +638,29 @@ def select_library(metadata, lib_name=None):
                 return lib
     return libs[0]
 
-assetIndex = {}
 
-for res in MulleResources:
+def collect_resource(res):
+    """
+    Resolve the cast members of a resource into a plain build entry.
 
+    Text members and animation charts are parsed right away, bitmaps and sounds
+    are only described here and get converted and packed by build_resource().
+    """
     resName = res.name
 
-    assetIndex[resName] = {'files': []}
-
-    print("")
-    print("- " + resName)
+    entry = {
+        'name': resName,
+        'opaque': res.opaque,
+        'images': [],
+        'sounds': [],
+        'strings': {},
+        'animations': {},
+        'files': [],
+        'definition': {'files': res.files, 'opaque': res.opaque},
+    }
 
-    atlasData = {}
-    soundSprite = {}
-    textString = {}
-    animations = {}
-
-    imageRects = []
-
-    packFiles = {}
-    packFiles[resName] = []
+    textString = entry['strings']
+    animations = entry['animations']
 
     missing_members = {}
 
@@ -654,77 +738,28 @@ for res in MulleResources:
                 print('Missing file %s' % fileBasePath + '.bmp')
                 continue
 
-            if f['num'] in opaque:
-                convert_image(fileBasePath + '.bmp', False)
-            else:
-                # Transparency is now based on palette index 255 (Director's background marker)
+            entry['images'].append({
+                'bmp': fileBasePath + '.bmp',
+                'path': fileBasePath + '.png',
+                'intName': str(len(entry['images']) + 1),
+                'width': mem['imageWidth'],
+                'height': mem['imageHeight'],
+                'pivot': {'x': mem['imageRegX'], 'y': mem['imageRegY']},
+                'dirFile': f['dir'],
+                'dirName': mem['name'].strip(),
+                'dirNum': f['num'],
+                'hash': mem['imageHash'],
+                'contentHash': shared_atlas.file_hash(fileBasePath + '.bmp'),
+                # Transparency is based on palette index 255 (Director's background marker)
                 # This preserves black outlines/borders while making backgrounds transparent
                 # Some sprites also need index 0 to be transparent
-                use_transparent_index_0 = f['num'] in transparent_index_0
-                convert_image(fileBasePath + '.bmp', transparent_index_0=use_transparent_index_0)
-
-            filePath = fileBasePath + ".png"
-
-            intName = str(len(atlasData) + 1)
-
-            p = {}
-
-            p['path'] = filePath;
-
-            p['width'] = mem['imageWidth'];
-            p['height'] = mem['imageHeight'];
-
-            p['data'] = {}
-
-            # p['data']['name'] = (atlasData.length + 1).toString();
-
-            p['data']['pivotX'] = mem['imageRegX']
-            p['data']['pivotY'] = mem['imageRegY']
-
-            p['data']['dirFile'] = f['dir']
-            p['data']['dirName'] = mem['name'].strip()
-            p['data']['dirNum'] = f['num']
-
-            # atlasData.push( p );
-            atlasData[intName] = p
+                'opaque': f['num'] in opaque,
+                'transparent_index_0': f['num'] in transparent_index_0,
+            })
 
-            assetIndex[resName]['files'].append(
+            entry['files'].append(
                 {'type': 'image', 'dirFile': f['dir'], 'dirName': mem['name'].strip(), 'dirNum': f['num']})
 
-            image_rect = ImageRect.ImageRect(filePath)
-
-            original = None
-
-            for v in imageRects:
-                # print("compare " + str( p['data']['dirFile'] ) + " " + str( p['data']['dirNum'] ) + " == " + str( v.dirFile ) + " " + str( v.dirNum ) )
-                # diff = ImageChops.difference(image_rect.image, v.image)
-                # print("diff " + str(diff))
-                if mem['imageHash'] == v.hash:
-                    original = v
-                    break
-
-            if original is not None:
-                # print("found duplicate")
-
-                dupe = {}
-                dupe['pivot'] = {'x': p['data']['pivotX'], 'y': p['data']['pivotY']}
-                dupe['baseName'] = intName
-                dupe['dirFile'] = p['data']['dirFile']
-                dupe['dirName'] = p['data']['dirName']
-                dupe['dirNum'] = p['data']['dirNum']
-
-                original.dupes.append(dupe)
-            else:
-                image_rect.pivot = {'x': p['data']['pivotX'], 'y': p['data']['pivotY']}
-                image_rect.baseName = intName
-                image_rect.dirFile = p['data']['dirFile']
-                image_rect.dirName = p['data']['dirName']
-                image_rect.dirNum = p['data']['dirNum']
-                image_rect.hash = mem['imageHash']
-                image_rect.dupes = []
-
-                imageRects.append(image_rect)
-
         # print("image " + f['dir'] + " " + str(lib['name']) + " " + str(f['num']))
         else:
             p = {'data': {}}
@@ -748,9 +783,11 @@ for res in MulleResources:
                 if 'soundCuePoints' in mem and len(mem['soundCuePoints']) > 0:
                     p['data']['cue'] = mem['soundCuePoints']
 
-                soundSprite[str(len(soundSprite) + 1)] = p
+                p['contentHash'] = shared_atlas.file_hash(filePath)
+
+                entry['sounds'].append(p)
 
-                assetIndex[resName]['files'].append(
+                entry['files'].append(
                     {'type': 'sound', 'dirFile': f['dir'], 'dirName': mem['name'].strip(), 'dirNum': f['num']})
 
             # print("audio " + f['dir'] + " " + str(lib['name']) + " " + str(f['num']))
@@ -791,30 +828,118 @@ for res in MulleResources:
               str(len(missing_members)) + " casts (e.g. " + sample_dir + " " + sample_nums +
               "). Set MULLE_ASSETS_STRICT=1 to list all missing members.")
 
+    return entry
+
+
+def build_resource(entry):
+    """
+    Convert, pack and encode a collected resource.
+
+    Args:
+        entry: resource entry from collect_resource()
+
+    Returns:
+        build result with the atlas pages written as [key, width, height],
+        the standalone backgrounds the same way, the output file names, the
+        resource's own pack entries, the audio sprites left for
+        start_audio() and, for shared resources, the shared pages each user
+        resource needs
+    """
+    resName = entry['name']
+
+    textString = entry['strings']
+    animations = entry['animations']
+
+    image_pages = []
+    result = {'pages': [], 'backgrounds': [], 'outputs': [], 'userPages': {}, 'pack': [], 'deferred': [],
+              'textures': {}, 'compact': [0] * 6, 'audio': [], 'streams': [0, 0], 'clips': []}
+
+    print("")
+    print("- " + resName)
+
     if len(textString) > 0:
         file = '%s/%s-strings.json' % (assetOutPath, resName)
         fp = open(file, 'w')
         json.dump(textString, fp)
+        result['outputs'].append(resName + '-strings.json')
 
     if len(animations) > 0:
         file = '%s/%s-animations.json' % (assetOutPath, resName)
         fp = open(file, 'w')
         json.dump(animations, fp)
+        result['outputs'].append(resName + '-animations.json')
+
+    imageRects = []
+    backgrounds = {}
+
+    for image in entry['images']:
+        # Members used by several resources may be converted by parallel builds at
+        # the same time, so write to a private file and move it into place.
+        tmpPath = '%s.%d.png' % (os.path.splitext(image['path'])[0], os.getpid())
+        if image['opaque']:
+            convert_image(image['bmp'], False, output_file=tmpPath)
+        else:
+            convert_image(image['bmp'], transparent_index_0=image['transparent_index_0'], output_file=tmpPath)
+        os.replace(tmpPath, image['path'])
+
+        if is_background(entry, image):
+            backgrounds.setdefault(image['hash'], []).append(image)
+            continue
+
+        original = None
+
+        for v in imageRects:
+            if image['hash'] == v.hash:
+                original = v
+                break
+
+        if original is not None:
+            dupe = {}
+            dupe['pivot'] = image['pivot']
+            dupe['baseName'] = image['intName']
+            dupe['dirFile'] = image['dirFile']
+            dupe['dirName'] = image['dirName']
+            dupe['dirNum'] = image['dirNum']
+            dupe['image'] = image
+
+            original.dupes.append(dupe)
+        else:
+            image_rect = ImageRect.ImageRect(image['path'])
+            image_rect.pivot = image['pivot']
+            image_rect.baseName = image['intName']
+            image_rect.dirFile = image['dirFile']
+            image_rect.dirName = image['dirName']
+            image_rect.dirNum = image['dirNum']
+            image_rect.hash = image['hash']
+            image_rect.image_entry = image
+            image_rect.dupes = []
+
+            imageRects.append(image_rect)
 
     print("Images: " + str(len(imageRects)))
-    print("Sounds: " + str(len(soundSprite)))
+    print("Backgrounds: " + str(len(backgrounds)))
+    print("Sounds: " + str(len(entry['sounds'])))
     print("Strings: " + str(len(textString)))
     print("Animations: " + str(len(animations)))
 
     if len(imageRects) > 0:
-        if res.opaque:
-            packer = Packer.create(max_width=2048, max_height=2048, bg_color=0xffffffff, trim_mode=1,
-                                   enable_rotated=False)
+        bg_color = 0xffffffff if entry['opaque'] else 0x00ffffff
+        if args.atlas_plan:
+            packer, atlas_list, plan = atlas_planner.plan(imageRects, bg_color, args.atlas_max_size,
+                                                          args.atlas_max_pages)
+            print("Atlas plan: max %dx%d, %d pages, %d%% used (was %d pages, %d%% used)" % (
+                plan['maxSize'][0], plan['maxSize'][1], len(plan['stats']['pages']),
+                plan['stats']['efficiency'] * 100, len(plan['baseline']['pages']),
+                plan['baseline']['efficiency'] * 100))
+            result['atlas'] = plan['stats']
+            result['atlas']['baseline'] = plan['baseline']
         else:
-            packer = Packer.create(max_width=2048, max_height=2048, bg_color=0x00ffffff, trim_mode=1,
-                                   enable_rotated=False)
-
-        atlas_list = packer._pack(imageRects)
+            packer = Packer.create(max_width=args.atlas_max_size, max_height=args.atlas_max_size, bg_color=bg_color,
+                                   trim_mode=1, enable_rotated=False)
+            atlas_list = packer._pack(imageRects)
+            if args.group_pages and len(atlas_list) > 1:
+                packer, atlas_list, result['usage'] = group_pages(entry, imageRects, bg_color, packer, atlas_list)
+            result['atlas'] = atlas_planner.stats(imageRects, atlas_list)
 
         for i, atlas in enumerate(atlas_list):
             print("Pack image " + str(i))
@@ -823,14 +948,15 @@ for res in MulleResources:
             fSprites['frames'] = {}
 
             packed_image = atlas.dump_image(packer.bg_color)
+            if args.png8:
+                indexed = png8.to_png8(packed_image)
+                print("Page is %s" % ("palette" if indexed else "RGBA, more than 256 colors"))
+                packed_image = indexed or packed_image
 
             atlasName = resName + '-sprites-' + str(i)
 
             PyTexturePackerUtils.save_image(packed_image, assetOutPath + "/" + atlasName + '.png')
 
-            if optimizeImages > 0:
-                call(['optipng', '-o', str(optimizeImages), os.path.join(assetOutPath, atlasName + '.png')])
-
             # make json
             for image_rect in atlas.image_rect_list:
                 width, height = (image_rect.width, image_rect.height) if not image_rect.rotated \
@@ -849,6 +975,7 @@ for res in MulleResources:
                 m['dirNum'] = image_rect.dirNum
 
                 fSprites['frames'][image_rect.baseName] = m
+                image_pages.append((image_rect.image_entry, atlasName))
 
                 if len(image_rect.dupes) > 0:
                     for dupe in image_rect.dupes:
@@ -860,6 +987,7 @@ for res in MulleResources:
                         n['dirNum'] = dupe['dirNum']
 
                         fSprites['frames'][dupe['baseName']] = n
+                        image_pages.append((dupe['image'], atlasName))
 
                     # print("dupe handled: " + dupe['dirFile'] + " - " + str(dupe['dirNum']) )
 
@@ -872,40 +1000,752 @@ for res in MulleResources:
             fSpritesOut = open(assetOutPath + "/" + atlasName + ".json", "w")
             fSpritesOut.write(json.dumps(fSprites))
             fSpritesOut.close()
+            write_compact(assetOutPath + "/" + atlasName + ".json", 'atlas', result)
 
-            packFiles[resName].append({
+            result['pack'].append({
                 "type": "atlasJSONHash",
                 "key": atlasName,
                 "textureURL": assetWebPath + '/' + atlasName + '.png',
                 "atlasURL": assetWebPath + '/' + atlasName + '.json',
+                "compactURL": assetWebPath + '/' + atlasName + '.compact.json',
                 "atlasData": None
             })
+            result['pages'].append([atlasName, packed_image.size[0], packed_image.size[1]])
+            result['outputs'] += [atlasName + '.png', atlasName + '.json']
+
+    for images in backgrounds.values():
+        deferred = args.progressive and progressive.is_deferred_background(images[0], scoreBackgrounds)
+        write_background(resName, images, result['deferred'] if deferred else result['pack'], result)
+
+    sounds = entry['sounds']
+    deferredSounds = []
+    if args.progressive:
+        deferredSounds = [s for s in sounds if progressive.is_deferred_sound(s, markerAudio)]
+        sounds = [s for s in sounds if s not in deferredSounds]
+        print("Deferred sounds: " + str(len(deferredSounds)))
+
+    write_audio(resName, sounds, result['pack'], result)
+    write_audio(resName + '-deferred', deferredSounds, result['deferred'], result)
+
+    if entry.get('shared'):
+        result['userPages'] = shared_atlas.pages_by_user(image_pages)
+
+    return result
+
+
+def group_pages(entry, imageRects, bg_color, packer, atlas_list):
+    """
+    Repack a multi-page resource so animation actions and scene members share
+    pages. The grouped layout is kept unless it needs more than one extra page
+    or spreads groups further.
+
+    Returns:
+        (packer, atlas list, pages touched per animation and per scene as [before, after])
+    """
+    groups = page_groups.animation_groups(entry['animations'])
+    animations = list(groups)
+    groups.update(sceneGroups)
+    if len(groups) == 0:
+        return packer, atlas_list, None
+
+    def touched(pages):
+        return [page_groups.pages_touched(dict((key, groups[key]) for key in animations), pages),
+                page_groups.pages_touched(sceneGroups, pages)]
+
+    before = touched(atlas_list)
+    groupedPacker, grouped = page_groups.pack_grouped(imageRects, groups, args.atlas_max_size, bg_color)
+    after = touched(grouped)
+    usage = {'animations': [before[0], after[0]], 'scenes': [before[1], after[1]], 'pages': [len(atlas_list),
+                                                                                              len(grouped)]}
+    print("Pages per animation %.2f -> %.2f, per scene %.2f -> %.2f, pages %d -> %d" % (
+        before[0], after[0], before[1], after[1], len(atlas_list), len(grouped)))
+
+    if len(grouped) > len(atlas_list) + 1 or sum(after) > sum(before):
+        print("Grouped layout not used")
+        # The rects hold the grouped positions now
+        return packer, packer._pack(imageRects), usage
+    return groupedPacker, grouped, usage
+
+
+def write_audio(name, sounds, pack, result):
+    """
+    Add the audio sprite name-audio of sounds to pack, and with --stream-audio
+    a file per long clip. They are encoded later by start_audio().
+    """
+    if len(sounds) == 0:
+        return
 
-    if len(soundSprite) > 0:
-        sprite = AudioSprite(resName)
-
-        for s in soundSprite:
-            sprite.addAudio(soundSprite[s]['path'], isLooped=soundSprite[s]['loop'], extraData=soundSprite[s]['data'])
-
-        outSprite = sprite.save(assetOutPath, resName + '-audio', formats=['ogg'], bitrate='32k',
-                                parameters=['-ar', '22050'])
-
-        packFiles[resName].append({
-            "type": "audiosprite",
-            "key": resName + "-audio",
-            "urls": assetWebPath + '/' + resName + '-audio.ogg',
-            "jsonURL": assetWebPath + '/' + resName + '-audio.json',
-            "jsonData": None
+    sounds, streams = audio_streams.split_streams(sounds, args.stream_audio)
+    if len(streams) > 0:
+        before = audio_streams.sprite_seconds(sounds + streams)
+        after = audio_streams.sprite_seconds(sounds)
+        result['streams'][0] += audio_streams.decoded_bytes(before)
+        result['streams'][1] += audio_streams.decoded_bytes(after)
+        print("Streamed sounds: %d, sprite %.1fs -> %.1fs" % (len(streams), before, after))
+
+    result['audio'].append([name, name + '-audio', sounds])
+    pack.append({
+        "type": "audiosprite",
+        "key": name + "-audio",
+        "urls": assetWebPath + '/' + name + '-audio.ogg',
+        "jsonURL": assetWebPath + '/' + name + '-audio.json',
+        "compactURL": assetWebPath + '/' + name + '-audio.compact.json',
+        "jsonData": None,
+        "mode": "sprite"
+    })
+
+    for s in streams:
+        key = audio_streams.stream_name(name, s)
+        result['audio'].append([name, key, [s]])
+        # Loaded but only decoded when played
+        pack.append({
+            "type": "audio",
+            "key": key,
+            "urls": [assetWebPath + '/' + key + '.' + fmt for fmt in audioSettings['formats']],
+            "autoDecode": False,
+            "jsonURL": assetWebPath + '/' + key + '.json',
+            "compactURL": assetWebPath + '/' + key + '.compact.json',
+            "mode": "stream",
+            "dirName": s['data']['dirName'],
+            "aliases": [alias['data']['dirName'] for alias in s.get('aliases', [])]
         })
 
-    fPackOut = open(assetOutPath + "/" + resName + ".json", "w")
+    for key in [name + '-audio'] + [audio_streams.stream_name(name, s) for s in streams]:
+        result['outputs'] += [key + '.' + fmt for fmt in audioSettings['formats']]
+        result['outputs'].append(key + '.json')
+        result['outputs'].append(os.path.basename(compact_meta.compact_path(key + '.json')))
+
+
+def encode_audio(name, key, sounds):
+    """
+    Write the audio sprite or stream key of resource name, its JSON and compact JSON.
+
+    Returns:
+        (sprite seconds, sprite seconds with 1 s silences, compact stats, encode seconds,
+         True if the sprite came from the cache, clip stats of --trim-audio)
+    """
+    start = time.time()
+    clips = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        # Streams are sprites of one clip written as key, not name-audio
+        sprite = AudioSprite(name if key == name + '-audio' else key)
+        if args.audio_layout == 'tight':
+            sprite.setGuardGap(AudioSprite.guardGap(audioSettings['formats']))
+        if args.normalize_audio:
+            sprite.setOutputRate(AudioSprite.outputRate(audioSettings['formats'], audioSettings['parameters']),
+                                 args.audio_cache and os.path.join(args.audio_cache, 'pcm'))
+        for s in sounds:
+            clip = sprite.addAudio(s['path'], isLooped=s['loop'], extraData=s['data'], aliases=s.get('aliases'))
+            if args.trim_audio:
+                clips.append(dict(trim_clip(sprite, clip), sprite=key))
+        sprite.save(assetOutPath, key, cache_dir=args.audio_cache, **audioSettings)
+        stats = compact_meta.write_compact(os.path.join(assetOutPath, key + '.json'), 'audio')
+    return sprite.duration(), audio_streams.sprite_seconds(sounds), stats, time.time() - start, sprite.cached, clips
+
+
+def trim_clip(sprite, clip):
+    """Level stats of an added clip, cutting its silence unless it loops. Cue points move with the start."""
+    seg = clip['seg']
+    stats = audio_trim.analyse(seg.raw_data, seg.sample_width, seg.channels, seg.frame_rate)
+    first, end = stats['trim']
+    if clip['loop'] or (first == 0 and end == stats['frames']):
+        first, end = 0, stats['frames']
+    else:
+        sprite.trimAudio(clip, first, end)
+        # Copies, the sound entries of the resource keep the untrimmed cues
+        clip['data'] = dict(clip['data'])
+        clip['aliases'] = [dict(alias, data=dict(alias['data'])) for alias in clip['aliases']]
+        audio_trim.shift_clip_cues(clip, int(round(first * 1000.0 / seg.frame_rate)), len(clip['seg']))
+    return dict(stats, trim=[first, end], id=clip['id'], dirFile=clip['data']['dirFile'], rate=seg.frame_rate,
+                trimmed=round((stats['frames'] - (end - first)) / float(seg.frame_rate), 3))
+
+
+def worker_pool():
+    """
+    The pool of --jobs workers that resource builds and audio encodes share.
+    Forked workers all start with the pool, before its manager thread runs,
+    so it is created once from the main thread and no worker is forked
+    from a process with other threads.
+    """
+    global workerPool
+    if workerPool is None:
+        workerPool = ProcessPoolExecutor(max_workers=args.jobs, mp_context=forkContext)
+    return workerPool
+
+
+def start_audio(result):
+    """
+    Queue the audio sprites of a build result. With --jobs they are encoded
+    in the worker pool while the next resources are built, largest sprite
+    first among the queued ones.
+    """
+    for name, key, sounds in result['audio']:
+        audioQueue.append((sum(os.path.getsize(s['path']) for s in sounds), name, key, sounds, result))
+    audioQueue.sort(key=lambda a: -a[0])
+    result['audio'] = []
+    if args.jobs > 1 and forkContext is not None:
+        schedule_audio()
+
+
+def schedule_audio():
+    """
+    Submit queued sprites while fewer than --jobs encodes run. Called from
+    the wait loops of build_resources() and finish_audio() on the main thread.
+    """
+    for future in [future for future in audioRunning if future.done()]:
+        audioRunning.discard(future)
+    while audioQueue and len(audioRunning) < args.jobs:
+        size, name, key, sounds, result = audioQueue.pop(0)
+        future = worker_pool().submit(encode_audio, name, key, sounds)
+        audioRunning.add(future)
+        audioEncodes.append((future, key, result))
+
+
+def finish_audio():
+    """Wait for the queued and running audio encodes and add their stats to the build results."""
+    global workerPool
+    if workerPool is None:
+        # No pool: encode here, largest first
+        while audioQueue:
+            size, name, key, sounds, result = audioQueue.pop(0)
+            audioEncodes.append((None, key, result) + encode_audio(name, key, sounds))
+    else:
+        schedule_audio()
+        while audioRunning:
+            wait(audioRunning, return_when=FIRST_COMPLETED)
+            schedule_audio()
+        workerPool.shutdown()
+        workerPool = None
+    if len(audioEncodes) == 0:
+        return
+
+    print("")
+    print("Audio sprites")
+    totalAudio = 0
+    fixedAudio = 0
+    encodedAudio = 0
+    totalTime = 0
+    hits = 0
+    for encode in audioEncodes:
+        future, key, result = encode[:3]
+        seconds, fixed, stats, elapsed, cached, clips = future.result() if future is not None else encode[3:]
+        result['clips'] += clips
+        result['compact'] = [total + value for total, value in zip(result['compact'], stats)]
+        result['audio'].append([key, round(seconds, 3), round(elapsed, 3), cached])
+        totalAudio += seconds
+        fixedAudio += fixed
+        layout = " (%.1fs with 1 s gaps)" % fixed if args.audio_layout == 'tight' else ""
+        if cached:
+            hits += 1
+            print("  %-32s %6.1fs audio%s from cache" % (key, seconds, layout))
+            continue
+        encodedAudio += seconds
+        totalTime += elapsed
+        print("  %-32s %6.1fs audio%s in %5.1fs, %4.0fx realtime" % (
+            key, seconds, layout, elapsed, seconds / max(elapsed, 0.001)))
+    print("  %d sprites with %.1fs audio, %d from cache, %.1fs encoded in %.1fs, %.0fx realtime" % (
+        len(audioEncodes), totalAudio, hits, encodedAudio, totalTime, encodedAudio / max(totalTime, 0.001)))
+    if args.audio_layout == 'tight':
+        print("  Tight layout: %.1fs -> %.1fs of sprite audio" % (fixedAudio, totalAudio))
+    del audioEncodes[:]
+
+
+def write_compact(path, kind, result):
+    """Write the compact form of an atlas or audio JSON and add its sizes and parse times to the result."""
+    stats = compact_meta.write_compact(path, kind)
+    result['compact'] = [total + value for total, value in zip(result['compact'], stats)]
+    result['outputs'].append(os.path.basename(compact_meta.compact_path(path)))
+
+
+def is_background(entry, image):
+    """Members written as standalone images by --backgrounds, never for shared atlases."""
+    return (args.backgrounds and image['opaque'] and not entry.get('shared') and
+            image['width'] * image['height'] >= args.background_min_pixels)
+
+
+def write_background(resName, images, pack, result):
+    """
+    Write a background member as lossy JPEG plus the other --image-formats,
+    and add it to pack as a one-page atlas with inline frame data, so
+    dirFile/dirNum lookups find it like any atlas frame. Members with the
+    same image share the file and get a frame each.
+    """
+    first = images[0]
+    key = resName + '-bg-' + first['intName']
+    with Image.open(first['path']) as image:
+        width, height = image.size
+
+    textures = []
+    for fmt in ['jpg'] + [fmt for fmt in imageFormats if fmt in image_formats.LOSSY_ENCODERS]:
+        fmt, path, size = image_formats.encode_lossy(first['path'], os.path.join(assetOutPath, key), fmt,
+                                                     args.background_quality)
+        textures.append({'format': fmt, 'url': assetWebPath + '/' + os.path.basename(path), 'bytes': size})
+        result['outputs'].append(os.path.basename(path))
+    textures.sort(key=lambda t: t['bytes'])
+
+    frames = {}
+    for image in images:
+        frames[image['intName']] = {
+            'frame': {"x": 0, "y": 0, "w": width, "h": height},
+            'regpoint': image['pivot'],
+            'dirFile': image['dirFile'],
+            'dirName': image['dirName'],
+            'dirNum': image['dirNum'],
+        }
+
+    print("Background %s: %dx%d, %d KB" % (key, width, height, textures[0]['bytes'] // 1024))
+    pack.append({
+        "type": "atlasJSONHash",
+        "key": key,
+        "textureURL": assetWebPath + '/' + key + '.jpg',
+        "atlasURL": None,
+        "atlasData": {
+            'frames': frames,
+            'meta': {"size": {"w": width, "h": height}, "image": assetWebPath + '/' + key + '.jpg', "scale": "1"},
+        },
+        "textures": textures,
+    })
+    result['backgrounds'].append([key, width, height])
+
+
+def texture_bytes(pages):
+    return sum(w * h * 4 for _, w, h in pages)
+
+
+def previous_result(entry, manifest):
+    """
+    Result of the previous build when the resource does not need to be rebuilt:
+    its manifest matches the current inputs, or it is left out by --only.
+    """
+    if onlyResources is not None and entry['name'] not in onlyResources:
+        previous = asset_manifest.load_manifest(assetOutPath, entry['name'])
+        if previous is None:
+            print("[" + entry['name'] + "] Not built yet, skipped (not in --only)")
+            return {'pages': [], 'backgrounds': [], 'outputs': [], 'userPages': {}, 'pack': [], 'deferred': [],
+                    'textures': {}, 'audio': []}
+        return previous['result']
+    if not args.force and onlyResources is None:
+        result = asset_manifest.is_up_to_date(assetOutPath, manifest)
+        if result is not None:
+            print("[" + entry['name'] + "] Up to date")
+            return result
+    return None
+
+
+def estimate_memory(entry):
+    """Rough peak memory of building a resource: decoded RGBA images plus atlas pages, and PCM copies of the audio."""
+    images = sum(image['width'] * image['height'] * 4 for image in entry['images'])
+    sounds = sum(os.path.getsize(sound['path']) for sound in entry['sounds'])
+    return images * 2 + sounds * 4
+
+
+def run_build(entry):
+    """Build a resource with its log captured, so parallel builds print one block per resource."""
+    start = time.time()
+    log = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(log):
+            result = build_resource(entry)
+    except Exception:
+        print(log.getvalue())
+        raise
+    return result, log.getvalue(), time.time() - start
+
+
+def build_resources(entries):
+    """
+    Build resources whose inputs changed, in parallel when --jobs allows it.
+
+    Resources are started largest first, and a new one only starts while the
+    estimated memory of the running builds stays under --max-memory (a single
+    resource larger than the budget still gets built, alone). Results are
+    returned by name, so callers merge them in resource order no matter which
+    build finished first.
+    """
+    results = {}
+    pending = []
+    for entry in entries:
+        manifest = asset_manifest.build_manifest(entry, buildSettings)
+        result = previous_result(entry, manifest)
+        if result is not None:
+            results[entry['name']] = result
+        else:
+            pending.append((estimate_memory(entry), entry, manifest))
+
+    pending.sort(key=lambda p: -p[0])
+
+    def finish(manifest, result, log, elapsed):
+        print(log, end='')
+        print("[" + manifest['name'] + "] Built in %.1fs" % elapsed)
+        builtManifests.append((manifest, result))
+        results[manifest['name']] = result
+        start_audio(result)
+        timings[manifest['name']] = elapsed
+
+    if args.jobs <= 1 or len(pending) <= 1 or forkContext is None:
+        for cost, entry, manifest in pending:
+            finish(manifest, *run_build(entry))
+        return results
+
+    budget = args.max_memory * 1024 * 1024
+    pool = worker_pool()
+    running = {}
+    while pending or running:
+        inFlight = sum(cost for cost, manifest in running.values())
+        while pending and len(running) < args.jobs and (not running or inFlight + pending[0][0] <= budget):
+            cost, entry, manifest = pending.pop(0)
+            running[pool.submit(run_build, entry)] = (cost, manifest)
+            inFlight += cost
+        # Finished encodes free a slot for the next queued sprite
+        done, _ = wait(list(running) + list(audioRunning), return_when=FIRST_COMPLETED)
+        for future in done:
+            if future in running:
+                cost, manifest = running.pop(future)
+                finish(manifest, *future.result())
+        schedule_audio()
+    return results
+
+
+def optimize_pages(built):
+    """Recompress the atlas pages written by this run, reusing cached pages."""
+    paths = [os.path.join(assetOutPath, key + '.png') for manifest, result in built for key, w, h in result['pages']]
+    if pngMode is None or len(paths) == 0:
+        return
+    print("")
+    print("Optimizing %d atlas pages (%s)" % (len(paths), pngMode))
+    start = time.time()
+    pages = png_optimize.optimize_files(paths, pngMode, args.png_cache, args.jobs if forkContext else 1, forkContext)
+    hits = sum(1 for page in pages if page[3])
+    before = sum(page[1] for page in pages)
+    after = sum(page[2] for page in pages)
+    print("  %d KB -> %d KB in %.1fs, %d of %d pages from cache" %
+          (before // 1024, after // 1024, time.time() - start, hits, len(pages)))
+
+
+def encode_pages(built):
+    """
+    Write the alternative formats of the atlas pages built by this run and
+    store every format's URL and byte size in the build result, smallest first.
+    """
+    for manifest, result in built:
+        for key, w, h in result['pages']:
+            path = os.path.join(assetOutPath, key + '.png')
+            result['textures'][key] = [{'format': 'png', 'url': assetWebPath + '/' + key + '.png',
+                                        'bytes': os.path.getsize(path)}]
+    paths = [os.path.join(assetOutPath, key + '.png') for manifest, result in built for key in result['textures']]
+    if len(imageFormats) == 0 or len(paths) == 0:
+        return
+    encoded = image_formats.encode_files(paths, imageFormats, args.png_cache,
+                                         args.jobs if forkContext else 1, forkContext)
+    for manifest, result in built:
+        for key, textures in result['textures'].items():
+            for fmt, path, size in encoded[os.path.join(assetOutPath, key + '.png')]:
+                # The PNG is always kept as fallback, a larger alternative is of no use
+                if size >= textures[0]['bytes']:
+                    os.remove(path)
+                    continue
+                textures.append({'format': fmt, 'url': assetWebPath + '/' + os.path.basename(path), 'bytes': size})
+                result['outputs'].append(os.path.basename(path))
+            textures.sort(key=lambda t: t['bytes'])
+
+
+def write_member_index(name, entries):
+    """Write name-members.json for the pack entries and return it with its own pack entry."""
+    index = member_index.build_index(assetOutPath, assetWebPath, entries)
+    with open(os.path.join(assetOutPath, name + '-members.json'), 'w') as fp:
+        json.dump(index, fp)
+    return index, {"type": "json", "key": name + "-members", "url": assetWebPath + '/' + name + '-members.json'}
+
+
+def write_pack(name, result, shared_pages, textures):
+    """
+    Write the Phaser asset pack of a resource. Atlas entries list every
+    encoding of their page in 'textures', the loader picks the first one the
+    browser supports. Deferred entries go under name-deferred, which
+    game.load.pack() ignores, the game loads them once the scene runs.
+    """
+    def entries(items):
+        out = []
+        for item in items:
+            item = dict(item)
+            if item['type'] == 'atlasJSONHash' and item['key'] in textures:
+                item['textures'] = textures[item['key']]
+            out.append(item)
+        return out
+
+    packFiles = {name: entries(list(shared_pages) + result['pack'])}
+    if result.get('deferred'):
+        packFiles[name + '-deferred'] = entries(result['deferred'])
+    fPackOut = open(assetOutPath + "/" + name + ".json", "w")
     fPackOut.write(json.dumps(packFiles))
     fPackOut.close()
 
+
+# Worker processes are forked so they share the resource definitions and
+# settings of this script instead of importing it again.
+forkContext = None
+if 'fork' in multiprocessing.get_all_start_methods():
+    forkContext = multiprocessing.get_context('fork')
+
+# Audio sprites waiting for start_audio()/finish_audio()
+audioQueue = []
+audioRunning = set()
+audioEncodes = []
+workerPool = None
+
+# Code changes rebuild through asset_manifest.code_hash(), which covers this
+# file. Bump only when the layout of the stored build results changes.
+ASSET_PIPELINE_VERSION = 10
+
+imageFormats = image_formats.available_formats([fmt.strip() for fmt in args.image_formats.split(',') if fmt.strip()])
+
+markerAudio = progressive.load_marker_audio()
+sceneGroups = page_groups.scene_groups(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'src', 'scenes'))
+scoreBackgrounds = progressive.load_score_backgrounds()
+
+# Everything besides the collected members that changes the generated files.
+audioSettings = {'formats': ['ogg'], 'bitrate': '32k', 'parameters': ['-ar', '22050']}
+buildSettings = {
+    'pipeline': ASSET_PIPELINE_VERSION,
+    'png': [pngMode, png_optimize.OPTIMIZER_VERSION],
+    'imageFormats': [imageFormats, image_formats.ENCODER_VERSION],
+    'audio': audioSettings,
+    'sharedAtlas': share_atlas,
+    'sharedAudio': share_audio,
+    'atlas': [args.atlas_plan, args.atlas_max_size, args.atlas_max_pages],
+    'png8': args.png8,
+    'groupPages': args.group_pages and [sorted((key, sorted(refs)) for key, refs in sceneGroups.items())],
+    'progressive': args.progressive and [sorted(markerAudio),
+                                         sorted((movie, sorted(nums)) for movie, nums in scoreBackgrounds.items())],
+    'backgrounds': [args.backgrounds, args.background_quality, args.background_min_pixels],
+    'streamAudio': args.stream_audio,
+    'audioLayout': args.audio_layout,
+    'trimAudio': args.trim_audio,
+    'normalizeAudio': args.normalize_audio,
+    'webPath': assetWebPath,
+    'code': asset_manifest.code_hash(),
+}
+
+onlyResources = None
+if args.only:
+    onlyResources = [name.strip() for name in args.only.split(',') if name.strip()]
+    unknown = [name for name in onlyResources if name not in [res.name for res in MulleResources]]
+    if unknown:
+        print("Unknown resources for --only: " + ", ".join(unknown))
+
+collected = [collect_resource(res) for res in MulleResources]
+
+# Sprites used by several resources can be packed once into a shared atlas
+# that every scene pack references. Set MULLE_ASSETS_SHARED_ATLAS=1 to enable.
+sharedResources = []
+for game in ['cars', 'boats']:
+    group = [entry for entry in collected if shared_atlas.resource_game(entry) == game]
+    name = 'common' if game == 'cars' else 'boten_common'
+    shared = shared_atlas.find_shared_images(group)
+    common = None
+    if len(shared) > 0:
+        saved = shared_atlas.shared_savings(group, shared)
+        print("")
+        print("Shared sprites (%s): %d used by several resources, %d KB uncompressed RGBA duplicated" %
+              (game, len(shared), saved // 1024))
+        if share_atlas:
+            common = shared_atlas.split_shared_images(group, shared, name)
+    if share_audio:
+        sharedSounds = shared_audio.find_shared_sounds(group)
+        print("")
+        print("Shared sounds (%s): %d used by several resources, %.1fs of duplicate audio removed" %
+              (game, len(sharedSounds), shared_audio.duplicate_seconds(sharedSounds)))
+        if len(sharedSounds) > 0:
+            if common is None:
+                common = shared_atlas.split_shared_images(group, {}, name)
+            shared_audio.split_shared_sounds(group, sharedSounds, common)
+    if common is not None:
+        sharedResources.append(common)
+
+if args.palette_report:
+    # Tiny bitmaps cost more as palette rows than as RGBA
+    variantGroups = [group for group in palette_variants.find_palette_variants(collected)
+                     if palette_variants.variant_savings(group) > 0]
+    variantGroups.sort(key=lambda g: -palette_variants.variant_savings(g))
+    print("")
+    print("Palette variants: %d bitmaps drawn with several palettes, %d KB as index textures and palette rows" %
+          (len(variantGroups), sum(palette_variants.variant_savings(g) for g in variantGroups) // 1024))
+    for group in variantGroups[:10]:
+        print("  %dx%d, %d palettes, %d KB: %s" % (
+            group['size'][0], group['size'][1], group['palettes'], palette_variants.variant_savings(group) // 1024,
+            ", ".join('%s %s/%s' % (res, dirFile, dirNum) for res, dirFile, dirNum, palette in group['members'][:4])))
+    if not os.path.exists(os.path.join(assetOutPath, '.build')):
+        os.makedirs(os.path.join(assetOutPath, '.build'))
+    with open(os.path.join(assetOutPath, '.build', 'palette-variants.json'), 'w') as fp:
+        json.dump(variantGroups, fp, indent=1)
+
+timings = {}
+builtManifests = []
+
+sharedPages = {}
+sharedPageSizes = {}
+sharedResults = build_resources(sharedResources)
+for entry in sharedResources:
+    result = sharedResults[entry['name']]
+    sharedPageSizes.update((key, (key, w, h)) for key, w, h in result['pages'])
+    for user, keys in result['userPages'].items():
+        sharedPages[user] = [{
+            "type": "atlasJSONHash",
+            "key": key,
+            "textureURL": assetWebPath + '/' + key + '.png',
+            "atlasURL": assetWebPath + '/' + key + '.json',
+            "compactURL": assetWebPath + '/' + key + '.compact.json',
+            "atlasData": None
+        } for key in keys]
+    # game.mulle.addAudio() of every user registers the shared sprite too
+    for user in entry.get('soundUsers', []):
+        sharedPages.setdefault(user, []).extend(
+            dict(item, shared=True) for item in result['pack'] + result['deferred']
+            if item['type'] in ('audiosprite', 'audio'))
+
+buildStart = time.time()
+builtResults = build_resources(collected)
+finish_audio()
+
+# Manifests are only written once the pages are optimized and encoded, an
+# interrupted build must not leave unfinished pages marked as up to date.
+optimize_pages(builtManifests)
+encode_pages(builtManifests)
+for manifest, result in builtManifests:
+    asset_manifest.save_manifest(assetOutPath, manifest, result)
+
+textureLists = {}
+for result in list(sharedResults.values()) + list(builtResults.values()):
+    textureLists.update(result['textures'])
+
+memberIndexes = {}
+for entry in sharedResources:
+    result = sharedResults[entry['name']]
+    memberIndexes[entry['name']], indexEntry = write_member_index(entry['name'], result['pack'] + result['deferred'])
+    write_pack(entry['name'], result, [indexEntry], textureLists)
+
+assetIndex = {}
+textureMemory = {}
+formatSavings = {}
+for entry in collected:
+    assetIndex[entry['name']] = {'files': entry['files']}
+    resShared = sharedPages.get(entry['name'], [])
+    result = builtResults[entry['name']]
+    # The runtime index covers the shared pages too, members.json only the resource's own files
+    memberIndexes[entry['name']], indexEntry = write_member_index(entry['name'], result['pack'] + result['deferred'])
+    if len(resShared) > 0:
+        indexEntry = write_member_index(entry['name'], resShared + result['pack'] + result['deferred'])[1]
+    write_pack(entry['name'], result, [indexEntry] + resShared, textureLists)
+    textureMemory[entry['name']] = texture_bytes(result['pages'] + result.get('backgrounds', []) +
+                                                 [sharedPageSizes[p['key']] for p in resShared
+                                                  if p['type'] == 'atlasJSONHash'])
+    pngBytes = sum(t['bytes'] for textures in result['textures'].values() for t in textures if t['format'] == 'png')
+    if pngBytes > 0:
+        formatSavings[entry['name']] = (pngBytes, sum(textures[0]['bytes'] for textures in result['textures'].values()))
+
 fIndexOut = open(assetOutPath + "/index.json", "w")
 fIndexOut.write(json.dumps(assetIndex))
 fIndexOut.close()
 
+with open(os.path.join(assetOutPath, 'members.json'), 'w') as fp:
+    json.dump(member_index.merge_indexes(memberIndexes), fp)
+
+if args.hash_names:
+    hashedFiles = hashed_names.publish(assetOutPath, assetWebPath,
+                                       [entry['name'] for entry in sharedResources + collected] + ['index'])
+    print("")
+    print("Wrote manifest.json with %d files, %d KB" %
+          (len(hashedFiles), sum(f['bytes'] for f in hashedFiles.values()) // 1024))
+
+# Packing efficiency and texture memory of every resource, including the ones
+# skipped as up to date, for comparing atlas settings between builds.
+atlasReport = {}
+for name, result in list(sharedResults.items()) + list(builtResults.items()):
+    if result.get('atlas') and result['atlas']['pages']:
+        atlasReport[name] = result['atlas']
+if not os.path.exists(os.path.join(assetOutPath, '.build')):
+    os.makedirs(os.path.join(assetOutPath, '.build'))
+with open(os.path.join(assetOutPath, '.build', 'atlas-report.json'), 'w') as fp:
+    json.dump(atlasReport, fp, indent=1, sort_keys=True)
+
+print("")
+print("Texture memory per resource (uncompressed RGBA):")
+for resName in sorted(textureMemory, key=lambda n: -textureMemory[n]):
+    if textureMemory[resName] == 0:
+        continue
+    atlasStats = builtResults[resName].get('atlas')
+    if atlasStats and atlasStats['pages']:
+        print("  %-16s %8d KB  %d pages, %3d%% used" % (resName, textureMemory[resName] // 1024,
+                                                      len(atlasStats['pages']), atlasStats['efficiency'] * 100))
+    else:
+        print("  %-16s %8d KB" % (resName, textureMemory[resName] // 1024))
+if len(sharedResources) > 0:
+    print("  (includes shared pages: %s)" % ", ".join(sorted(sharedPageSizes)))
+
+if len(imageFormats) > 0 and len(formatSavings) > 0:
+    print("")
+    print("Atlas bytes per resource, PNG -> smallest of png, %s:" % ", ".join(imageFormats))
+    for resName in sorted(formatSavings, key=lambda n: -formatSavings[n][0]):
+        pngBytes, bestBytes = formatSavings[resName]
+        print("  %-16s %8d KB -> %8d KB (%d%%)" %
+              (resName, pngBytes // 1024, bestBytes // 1024, 100 - bestBytes * 100 // pngBytes))
+
+streamSavings = dict((name, result['streams']) for name, result in builtResults.items()
+                     if result.get('streams', [0, 0])[0] > 0)
+if len(streamSavings) > 0:
+    print("")
+    print("Decoded audio sprite memory per scene with streamed clips (%d Hz float):" % audio_streams.DECODED_RATE)
+    for resName in sorted(streamSavings, key=lambda n: streamSavings[n][1] - streamSavings[n][0]):
+        before, after = streamSavings[resName]
+        print("  %-16s %8d KB -> %8d KB" % (resName, before // 1024, after // 1024))
+
+if args.trim_audio:
+    clipStats = [clip for result in list(sharedResults.values()) + list(builtResults.values())
+                 for clip in result.get('clips', [])]
+    trimmed = [clip for clip in clipStats if clip['trimmed'] > 0]
+    print("")
+    print("Audio trimming: %d of %d clips, %.1fs of silence removed" % (
+        len(trimmed), len(clipStats), sum(clip['trimmed'] for clip in trimmed)))
+    quiet = [clip for clip in clipStats if clip['peak'] is not None and clip['peak'] < -12]
+    if quiet:
+        print("  %d clips peak below -12 dBFS" % len(quiet))
+    with open(os.path.join(assetOutPath, '.build', 'audio-report.json'), 'w') as fp:
+        json.dump(sorted(clipStats, key=lambda clip: (clip['sprite'], clip['id'])), fp, indent=1)
+
+if args.tile_report:
+    tileReport = {}
+    for entry in collected:
+        unique = {}
+        for image in entry['images']:
+            if os.path.exists(image['path']):
+                unique.setdefault(image['hash'], image['path'])
+        if len(unique) > 0:
+            tileReport[entry['name']] = tile_dedupe.resource_tiles(list(unique.values()), args.tile_report)
+    with open(os.path.join(assetOutPath, '.build', 'tile-report.json'), 'w') as fp:
+        json.dump(tileReport, fp, indent=1, sort_keys=True)
+    print("")
+    print("Atlas area saved with %dx%d tiles (empty and repeated tiles dropped):" % (args.tile_report, args.tile_report))
+    for resName in sorted(tileReport, key=lambda n: -tileReport[n]['saved'])[:10]:
+        stats = tileReport[resName]
+        saving = "%d%%" % (stats['saved'] * 100 // max(stats['area'], 1)) if stats['saved'] > 0 else "no saving"
+        print("  %-16s %5d frames, %8d KB -> %8d KB RGBA (%s)" % (
+            resName, stats['frames'], stats['area'] * 4 // 1024, stats['tileArea'] * 4 // 1024, saving))
+
+compactStats = [0] * 6
+for result in list(sharedResults.values()) + list(builtResults.values()):
+    compactStats = [total + value for total, value in zip(compactStats, result.get('compact', [0] * 6))]
+if compactStats[0] > 0:
+    print("")
+    print("Atlas and audio metadata, JSON -> compact: %d KB -> %d KB, gzip %d KB -> %d KB, "
+          "parse %.1fms -> %.1fms" % (compactStats[0] // 1024, compactStats[1] // 1024, compactStats[2] // 1024,
+                                      compactStats[3] // 1024, compactStats[4] * 1000, compactStats[5] * 1000))
+
+if len(timings) > 0:
+    print("")
+    print("Built %d resources in %.1fs with %d jobs, slowest:" % (len(timings), time.time() - buildStart, args.jobs))
+    for resName in sorted(timings, key=lambda n: -timings[n])[:10]:
+        print("  %-16s %6.1fs" % (resName, timings[resName]))
+
 # ----------------------------------------------------------------------------
 # Copy boat topology text fields (30t*.txt) for Lingo-accurate sea collision
 # ----------------------------------------------------------------------------
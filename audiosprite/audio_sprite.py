@@ -1,10 +1,31 @@
 import os
 import json
+import hashlib
+import shutil
+import subprocess
 from pydub import AudioSegment
 
 from .exceptions import (
         InvalidSource
 )
+from .normalize import normalize
+
+# Bump when the encoded output changes for the same clips and settings,
+# so cached sprites are not reused.
+ENCODER_VERSION = 1
+
+_ffmpegVersion = None
+
+
+def ffmpegVersion():
+    """ First line of `ffmpeg -version`, part of the cache key
+    """
+    global _ffmpegVersion
+    if _ffmpegVersion is None:
+        proc = subprocess.run(['ffmpeg', '-version'], capture_output=True)
+        _ffmpegVersion = proc.stdout.decode('utf-8', 'replace').split('\n')[0]
+    return _ffmpegVersion
+
 
 #ffmpeg -y -f mp3 -i test/data/test1.mp3 -c:a libfaac test1.aac
 class AudioSprite(object):
@@ -18,13 +39,33 @@ class AudioSprite(object):
 
     SILENCE_DURATION = 1000
 
+    # Smallest silence in ms that keeps clips apart in the tight layout. Opus
+    # skips 312 samples (6.5 ms) of pre-roll, MP3 and AAC decoders add up to
+    # ~50 ms of delay, and browsers start and stop a sprite region a few ms
+    # off, so the gaps are a bit larger than the codec delay.
+    GUARD_GAPS = {
+        'ogg': 30, 'mp3': 80, 'm4a': 80
+    }
+
+    # Looped regions restart from a timer, they overrun more than one shot clips
+    LOOP_GAP = 250
+
+    # libopus only supports 8000, 12000, 16000, 24000 and 48000 Hz
+    OPUS_RATE = 24000
+
     def __init__(self, id, data=None, *args, **kwargs):
         self._data = data
         self._files = []
         self._id = id
         self._useSilence = True
         self._silenceDuration = self.SILENCE_DURATION
+        self._guardGap = None
+        self._loopGap = self.LOOP_GAP
         self._maxLevel = -1
+        self._outfile = None
+        self._outputRate = None
+        self._pcmCacheDir = None
+        self.cached = False
 
         super(AudioSprite, self).__init__(*args, **kwargs)
 
@@ -37,15 +78,31 @@ class AudioSprite(object):
     def __getitem__(self, idx):
         return self._files[idx]
 
+    def duration(self):
+        """ Length of the generated sprite in seconds, silences included
+        """
+        if self.cached:
+            return max(clip['end'] for clip in self._data['spritemap'].values())
+        last = self._files[-1]
+        return (last['start'] + last['frames']) / float(self._frameRate)
+
     def findIndexOf(self, path):
         return map(lambda f: f['path'], self).index(path)
 
     def setMaxAudioLevel(self, level):
         self._maxLevel = level
 
-    def addAudio(self, filePath, volume=None, isLooped=False, cuePoints=[], extraData={}):
+    def addAudio(self, filePath, volume=None, isLooped=False, cuePoints=[], extraData={}, gap=None, aliases=None):
         """ Main interface for adding audio to the sprite.
         Takes any audio format that ffmpeg supports
+
+        gap (int)
+            With setGuardGap(), the silence in ms this clip needs on both sides
+            instead of the guard gap or loop gap
+
+        aliases (list)
+            {'data': extraData, 'loop': isLooped} of other members with the
+            same audio, listed as clips on the same region of the sprite
         """
         fileName, fileExtension = os.path.splitext(filePath)
         try:
@@ -57,7 +114,7 @@ class AudioSprite(object):
         if (self._useSilence and len(self._files) > 0): 
             self._files.append({
                 'id': 'SILENCE',
-                'length': self._calcSilenceLen()
+                'length': self._calcSilenceLen(self._files[-1], {'loop': isLooped, 'gap': gap})
                 })
 
         # Use dirName from extraData if available (unique identifier like '70d001v0')
@@ -71,7 +128,9 @@ class AudioSprite(object):
             'volume': volume,
             'params': None,
             'loop': isLooped,
-            'data': extraData
+            'gap': gap,
+            'data': extraData,
+            'aliases': aliases or []
             }
 
         if volume != None:
@@ -84,6 +143,13 @@ class AudioSprite(object):
 
         return config
 
+    def trimAudio(self, config, startFrame, endFrame):
+        """ Keeps frames startFrame to endFrame of an added clip (the config addAudio() returned)
+        """
+        seg = config['seg']
+        config['seg'] = seg._spawn(seg.raw_data[startFrame * seg.frame_width:endFrame * seg.frame_width])
+        return config['seg']
+
     def changeFileVolume(self, file_path, volume_change):
         """
         Changes a single file's volume by volume_change (+ or -)
@@ -102,7 +168,40 @@ class AudioSprite(object):
         if duration > 0:
             self._silenceDuration = duration
 
-    def save(self, saveDir, outfile, formats=EXPORT_FORMATS, save_source=False, bitrate=None, parameters=None, tags=None, id3v2_version='4'):
+    def setGuardGap(self, duration, loopDuration=LOOP_GAP):
+        """ Tight layout: separate clips by duration ms instead of the fixed
+        silence, and by loopDuration next to looped clips. Call before adding
+        audio, see guardGap() for a duration that suits the output formats.
+        """
+        self._guardGap = duration
+        self._loopGap = loopDuration
+
+    @classmethod
+    def guardGap(cls, formats):
+        return max(cls.GUARD_GAPS.get(fmt, cls.SILENCE_DURATION) for fmt in formats)
+
+    def setOutputRate(self, rate, cacheDir=None):
+        """ Convert every clip once to 16-bit PCM at rate before it is
+        concatenated, instead of pydub converting to the highest clip rate and
+        ffmpeg resampling that again. Converted clips are kept in cacheDir.
+        See outputRate() for the rate the encoder takes.
+        """
+        self._outputRate = rate
+        self._pcmCacheDir = cacheDir
+
+    @classmethod
+    def outputRate(cls, formats, parameters=None):
+        """ Sample rate the encoders of formats write: the opus rate for ogg,
+        else the -ar of parameters
+        """
+        if 'ogg' in formats:
+            return cls.OPUS_RATE
+        parameters = list(parameters or [])
+        if '-ar' in parameters[:-1]:
+            return int(parameters[parameters.index('-ar') + 1])
+        return None
+
+    def save(self, saveDir, outfile, formats=EXPORT_FORMATS, save_source=False, bitrate=None, parameters=None, tags=None, id3v2_version='4', cache_dir=None):
         """ Generates audiosprite files and control data JSON file
 
         saveDir (string):
@@ -128,18 +227,61 @@ class AudioSprite(object):
 
         id3v2_version (string)
             Set ID3v2 version for tags. (default: '4')
+
+        cache_dir (string)
+            Reuse the sprite files and JSON of an earlier save with the same
+            clips and settings from this directory, and store new ones there.
+            Not used with save_source.
         """
         # create save dir if necessary
         if not os.path.exists(saveDir):
             os.makedirs(saveDir)
 
         fileBase = os.path.join(saveDir, outfile)
+        self._outfile = outfile
+
+        cached = None
+        if cache_dir and not save_source:
+            cached = os.path.join(cache_dir, self.cacheKey(formats, bitrate, parameters, tags, id3v2_version))
+            if all(os.path.exists(cached + '.' + ext) for ext in list(formats) + ['json']):
+                for ext in list(formats) + ['json']:
+                    shutil.copyfile(cached + '.' + ext, fileBase + '.' + ext)
+                with open(fileBase + '.json') as fp:
+                    self._data = json.load(fp)
+                self.cached = True
+                return True
 
         if self._generateAudioSprite(outfile, saveDir, formats, save_source, bitrate, parameters, tags, id3v2_version): 
-            return self._generateDataFile(fileBase)
+            self._generateDataFile(fileBase)
+            if cached:
+                if not os.path.exists(cache_dir):
+                    os.makedirs(cache_dir, exist_ok=True)
+                for ext in list(formats) + ['json']:
+                    shutil.copyfile(fileBase + '.' + ext, cached + '.%d.%s' % (os.getpid(), ext))
+                    os.replace(cached + '.%d.%s' % (os.getpid(), ext), cached + '.' + ext)
+            return True
 
         return False
 
+    def cacheKey(self, formats, bitrate, parameters, tags, id3v2_version):
+        """ Hash of everything that ends up in the sprite files and JSON:
+        clip PCM and layout, clip data and the encoder settings and version
+        """
+        digest = hashlib.sha1()
+        layout = []
+        for f in self._files:
+            if self._isSilence(f):
+                layout.append(['SILENCE', f['length']])
+                continue
+            seg = f['seg']
+            digest.update(seg.raw_data)
+            layout.append([f['id'], seg.frame_rate, seg.channels, seg.sample_width, len(seg.raw_data),
+                           f['params'], f['loop'], f['data'], f['aliases']])
+        settings = [self._id, layout, list(formats), bitrate, parameters, tags, id3v2_version,
+                    self._outputRate, ENCODER_VERSION, ffmpegVersion()]
+        digest.update(json.dumps(settings, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()
+
     def _getAdjustedAudioVolumeParams(self, ratio):
         # First generate adjusted volume file with converter
         # Then load the converted file back into memory and save it in our config
@@ -179,57 +321,131 @@ class AudioSprite(object):
         # save 1st wav
 
         print("Generating final sprites...")
-        for fmt in formats:
-            out = self._files[0]['seg']
-            # concat all teh sounds - they are volume adjusted already
-            for f in self._files[1:]:
-                if self._isSilence(f):
-                    out = out + AudioSegment.silent(f['length'])
-                else: 
-                    out = out + f['seg']
-
-            fname = os.path.join(saveDir, fileBase + '.' + fmt)
+        # concat all teh sounds once - they are volume adjusted already
+        out = self._concatenate()
+        outputs = [(os.path.join(saveDir, fileBase + '.' + fmt), fmt) for fmt in formats]
+        for fname, fmt in outputs:
             print("Exporting to " + fname)
-            
-            if fmt == 'ogg':
-                # Workaround: pydub uses libvorbis which may not be compiled in ffmpeg
-                # Export to wav first, then use ffmpeg directly with libopus
-                # Note: libopus only supports 8000, 12000, 16000, 24000, 48000 Hz
-                import subprocess
-                import tempfile
-                with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp:
-                    wav_path = tmp.name
-                out.export(wav_path, format='wav')
-                # Filter out -ar parameter since opus has specific sample rate requirements
-                filtered_params = []
-                skip_next = False
-                if parameters:
-                    for i, p in enumerate(parameters):
-                        if skip_next:
-                            skip_next = False
-                            continue
-                        if p == '-ar':
-                            skip_next = True  # Skip -ar and its value
-                            continue
-                        filtered_params.append(p)
-                ffmpeg_params = ['ffmpeg', '-y', '-i', wav_path, '-acodec', 'libopus', '-ar', '24000']
-                if bitrate:
-                    ffmpeg_params.extend(['-b:a', bitrate])
-                ffmpeg_params.extend(filtered_params)
-                ffmpeg_params.append(fname)
-                subprocess.run(ffmpeg_params, check=True, capture_output=True)
-                os.unlink(wav_path)
-            else:
-                out.export(fname, format=fmt, bitrate=bitrate, parameters=parameters, tags=tags, id3v2_version=id3v2_version) 
+        self._encode(out, outputs, bitrate, parameters, tags, id3v2_version)
 
         return True
 
+    def _concatenate(self):
+        """ Joins clips and silences into one AudioSegment.
+
+        The output buffer is allocated once from the clip lengths, every clip
+        is converted to the common format on its own and copied in, so time
+        and memory grow linearly with the sprite length. Offsets are recorded
+        in frames as 'start' and 'frames' of every entry in self._files.
+        With setOutputRate() clips are converted to 16-bit at that rate.
+        """
+        clips = list(self._realFiles())
+        segs = [f['seg'] for f in clips]
+        if len(self._files) > len(clips):
+            # pydub silences are 16-bit mono
+            segs.append(AudioSegment.silent(0))
+
+        channels = max(seg.channels for seg in segs)
+        frame_rate = max(seg.frame_rate for seg in segs)
+        sample_width = max(seg.sample_width for seg in segs)
+        if self._outputRate:
+            frame_rate = self._outputRate
+            sample_width = 2
+        frame_width = channels * sample_width
+
+        parts = []
+        total = 0
+        for f in self._files:
+            if self._isSilence(f):
+                data = None
+                frames = int(round(frame_rate * f['length'] / 1000.0))
+            else:
+                if self._outputRate:
+                    data = normalize(f['seg'], frame_rate, channels, self._pcmCacheDir)
+                else:
+                    data = f['seg'].set_channels(channels).set_frame_rate(frame_rate).set_sample_width(sample_width)._data
+                frames = len(data) // frame_width
+            f['start'] = total
+            f['frames'] = frames
+            parts.append(data)
+            total += frames
+
+        # zero filled, silences are left as they are
+        out = bytearray(total * frame_width)
+        view = memoryview(out)
+        for f, data in zip(self._files, parts):
+            if data is not None:
+                start = f['start'] * frame_width
+                view[start:start + len(data)] = data
+        view.release()
+
+        self._frameRate = frame_rate
+        return AudioSegment(data=out, sample_width=sample_width, frame_rate=frame_rate, channels=channels)
+
+    def _outputArgs(self, fmt, bitrate, parameters, tags, id3v2_version):
+        """ ffmpeg output options for one format, the same pydub's export() uses
+        """
+        if fmt == 'ogg':
+            # Workaround: pydub uses libvorbis which may not be compiled in ffmpeg
+            # so ogg is encoded with libopus
+            # Note: libopus only supports 8000, 12000, 16000, 24000, 48000 Hz
+            args = ['-acodec', 'libopus', '-ar', str(self.OPUS_RATE)]
+            if bitrate:
+                args.extend(['-b:a', bitrate])
+            # Filter out -ar parameter since opus has specific sample rate requirements
+            skip_next = False
+            for p in parameters or []:
+                if skip_next:
+                    skip_next = False
+                    continue
+                if p == '-ar':
+                    skip_next = True  # Skip -ar and its value
+                    continue
+                args.append(p)
+            return args
+
+        args = []
+        if bitrate:
+            args.extend(['-b:a', bitrate])
+        args.extend(parameters or [])
+        for key, value in (tags or {}).items():
+            args.extend(['-metadata', '{0}={1}'.format(key, value)])
+        if tags and fmt == 'mp3':
+            args.extend(['-id3v2_version', id3v2_version])
+        return args + ['-f', fmt]
+
+    def _encode(self, out, outputs, bitrate, parameters, tags, id3v2_version):
+        """ Encodes the sprite PCM to every (path, format) of outputs.
+
+        The raw samples are piped to a single ffmpeg process that writes all
+        outputs, so there is no intermediate WAV on disk and the input is
+        only read once.
+        """
+        sampleFormat = {1: 's8', 2: 's16le', 4: 's32le'}[out.sample_width]
+        command = ['ffmpeg', '-y', '-f', sampleFormat, '-ar', str(out.frame_rate), '-ac', str(out.channels),
+                   '-i', 'pipe:0']
+        for fname, fmt in outputs:
+            command.extend(self._outputArgs(fmt, bitrate, parameters, tags, id3v2_version))
+            command.append(fname)
+
+        proc = subprocess.run(command, input=out.raw_data, capture_output=True)
+        if proc.returncode != 0:
+            raise Exception("Encoding %s failed: %s" % (
+                ', '.join(fname for fname, fmt in outputs), proc.stderr.decode('utf-8', 'replace')[-2000:]))
+
     def _realFiles(self):
         return filter(lambda f: not self._isSilence(f), self._files)
 
-    def _calcSilenceLen(self):
-        # TODO: Dynamic duration may be desired
-        return self._silenceDuration
+    def _calcSilenceLen(self, before, after):
+        if self._guardGap is None:
+            return self._silenceDuration
+
+        def clipGap(f):
+            if f.get('gap') is not None:
+                return f['gap']
+            return self._loopGap if f['loop'] else self._guardGap
+
+        return max(clipGap(before), clipGap(after))
 
     def _isSilence(self, config):
         return config['id'] == 'SILENCE'
@@ -261,17 +477,25 @@ class AudioSprite(object):
         return True
 
     def _genSpriteData(self):
-        self._data = {'resources': ['assets/' + self._id + '-audio.ogg'], 'spritemap': {}}
+        self._data = {'resources': ['assets/' + (self._outfile or self._id + '-audio') + '.ogg'], 'spritemap': {}}
         start = 0
 
         for f in self._files:
             if not self._isSilence(f):
                 sound_data = {} # self._getSoundData(f)
-                sound_data['start'] = start / 1000
-                sound_data['end'] = ( start + len(f['seg']) ) / 1000
+                if 'start' in f:
+                    # exact offsets recorded by _concatenate()
+                    sound_data['start'] = round(f['start'] / float(self._frameRate), 6)
+                    sound_data['end'] = round((f['start'] + f['frames']) / float(self._frameRate), 6)
+                else:
+                    sound_data['start'] = start / 1000
+                    sound_data['end'] = ( start + len(f['seg']) ) / 1000
                 sound_data['loop'] = f['loop']
                 sound_data['data'] = f['data']
                 self._data['spritemap'][ f['id'] ] = sound_data
+                for alias in f['aliases']:
+                    self._data['spritemap'][ alias['data']['dirName'] ] = dict(sound_data, loop=alias['loop'],
+                                                                               data=alias['data'])
                 start += len(f['seg'])
             else:
                 # Add silence duration for next track's start time
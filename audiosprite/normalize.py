@@ -0,0 +1,96 @@
+""" Converts clips to the sample rate and format the encoder takes, once.
+
+Extracted sounds come as 8-bit 11025/22050 Hz and 16-bit clips. Without
+this every clip is resampled to the highest rate of its sprite by pydub
+and then again by ffmpeg for libopus. normalize() converts the samples of a
+clip straight to 16-bit at the output rate with a windowed sinc polyphase
+filter, and can keep the result in a cache directory.
+"""
+import hashlib
+import os
+from math import gcd
+
+import numpy as np
+
+# Bump when the converted samples change, so cached PCM is not reused
+NORMALIZE_VERSION = 1
+
+# Taps per side of the filter, in input or output samples whichever rate
+# is higher, and the Kaiser window beta
+HALF_TAPS = 10
+KAISER_BETA = 5.0
+
+SAMPLE_TYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+_filters = {}
+
+
+def lowpass(up, down):
+    """ Polyphase lowpass filter for resampling by up/down, as [phase, tap]
+    """
+    key = (up, down)
+    if key not in _filters:
+        rate = max(up, down)
+        half = HALF_TAPS * rate
+        n = np.arange(-half, half + 1)
+        h = np.sinc(n / float(rate)) * np.kaiser(len(n), KAISER_BETA)
+        h *= up / h.sum()
+        taps = -(-len(h) // up)
+        h = np.concatenate([h, np.zeros(taps * up - len(h))])
+        _filters[key] = (h.reshape(taps, up).T.copy(), half)
+    return _filters[key]
+
+
+def resample_poly(x, up, down):
+    """ Resample the float samples x (frames, channels) by up/down
+    """
+    if up == down:
+        return x
+    phases, delay = lowpass(up, down)
+    taps = phases.shape[1]
+    frames = -(-len(x) * up // down)
+    # taps - 1 frames of zeros before the clip, and enough after it for the filter delay
+    padded = np.concatenate([np.zeros((taps - 1, x.shape[1])), x,
+                             np.zeros((delay // up + taps + 1, x.shape[1]))])
+    out = np.empty((frames, x.shape[1]))
+    for channel in range(x.shape[1]):
+        # windows[i] are x[i - taps + 1] .. x[i]
+        windows = np.lib.stride_tricks.sliding_window_view(padded[:, channel], taps)
+        # Every up-th output uses the same phase and starts down input frames later
+        for first in range(min(up, frames)):
+            j = first * down + delay
+            count = len(range(first, frames, up))
+            rows = windows[j // up:j // up + (count - 1) * down + 1:down]
+            out[first::up, channel] = rows.dot(phases[j % up, ::-1])
+    return out
+
+
+def normalize(seg, rate, channels, cache_dir=None):
+    """ 16-bit PCM bytes of an AudioSegment at rate with channels
+    """
+    cached = None
+    if cache_dir:
+        digest = hashlib.sha1(seg.raw_data)
+        digest.update(('%d-%d-%d-%d-%d-%d' % (seg.frame_rate, seg.channels, seg.sample_width,
+                                              rate, channels, NORMALIZE_VERSION)).encode('ascii'))
+        cached = os.path.join(cache_dir, digest.hexdigest() + '.s16')
+        if os.path.exists(cached):
+            with open(cached, 'rb') as fp:
+                return fp.read()
+
+    x = np.frombuffer(seg.raw_data, dtype=SAMPLE_TYPES[seg.sample_width]).reshape(-1, seg.channels)
+    x = x.astype(np.float64) / float(2 ** (8 * seg.sample_width - 1))
+    if seg.channels != channels:
+        # pydub's mono to stereo copies the channel, stereo to mono averages
+        x = np.repeat(x, channels, axis=1) if seg.channels == 1 else x.mean(axis=1, keepdims=True)
+    divisor = gcd(rate, seg.frame_rate)
+    y = resample_poly(x, rate // divisor, seg.frame_rate // divisor)
+    data = np.clip(np.round(y * 32768), -32768, 32767).astype('<i2').tobytes()
+
+    if cached:
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        with open(cached + '.%d' % os.getpid(), 'wb') as fp:
+            fp.write(data)
+        os.replace(cached + '.%d' % os.getpid(), cached)
+    return data
@@ -0,0 +1,104 @@
+import hashlib
+import json
+import os
+
+from build_scripts.data import director_data
+
+# Modules whose code changes the generated assets. assets.py holds the
+# resource definitions too, so editing one of them rebuilds every resource.
+PIPELINE_MODULES = [
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'assets.py'),
+    os.path.join(os.path.dirname(__file__), 'atlas_planner.py'),
+    os.path.join(os.path.dirname(__file__), 'audio_streams.py'),
+    os.path.join(os.path.dirname(__file__), 'audio_trim.py'),
+    os.path.join(os.path.dirname(__file__), 'compact_meta.py'),
+    os.path.join(os.path.dirname(__file__), 'convert_image.py'),
+    os.path.join(os.path.dirname(__file__), 'page_groups.py'),
+    os.path.join(os.path.dirname(__file__), 'parse_animation_chart.py'),
+    os.path.join(os.path.dirname(__file__), 'png8.py'),
+    os.path.join(os.path.dirname(__file__), 'progressive.py'),
+    os.path.join(os.path.dirname(__file__), 'shared_atlas.py'),
+    os.path.join(os.path.dirname(__file__), 'shared_audio.py'),
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'audiosprite', 'audio_sprite.py'),
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), 'audiosprite', 'normalize.py'),
+]
+
+
+def json_hash(value):
+    """Stable SHA-1 of a JSON-serializable value."""
+    return hashlib.sha1(json.dumps(value, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def code_hash(paths=None):
+    digest = hashlib.sha1()
+    for path in paths or PIPELINE_MODULES:
+        if os.path.exists(path):
+            with open(path, 'rb') as fp:
+                digest.update(fp.read())
+    return digest.hexdigest()
+
+
+def resource_movies(entry):
+    movies = set()
+    for image in entry['images']:
+        movies.add(image['dirFile'])
+    for sound in entry['sounds']:
+        movies.add(sound['data']['dirFile'])
+    movies.update(entry['strings'].keys())
+    movies.update(entry['animations'].keys())
+    return sorted(movies)
+
+
+def build_manifest(entry, settings):
+    """
+    Describe every input that ends up in a resource's output files.
+
+    The collected entry already holds the resource definition, the member
+    content hashes and the parsed text members. The director_data flags of
+    every movie used by the resource and the encoder settings are added to it.
+    """
+    inputs = {
+        'entry': entry,
+        'directorData': dict((movie, director_data.data.get(movie)) for movie in resource_movies(entry)),
+        'settings': settings,
+    }
+    return {'name': entry['name'], 'hash': json_hash(inputs)}
+
+
+def manifest_path(out_dir, name):
+    return os.path.join(out_dir, '.build', name + '.json')
+
+
+def load_manifest(out_dir, name):
+    path = manifest_path(out_dir, name)
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as fp:
+            return json.load(fp)
+    except ValueError:
+        return None
+
+
+def save_manifest(out_dir, manifest, result):
+    path = manifest_path(out_dir, manifest['name'])
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    data = dict(manifest)
+    data['result'] = result
+    with open(path, 'w') as fp:
+        json.dump(data, fp)
+
+
+def is_up_to_date(out_dir, manifest):
+    """
+    Returns the stored build result when the previous build used the same
+    inputs and all its output files still exist, None otherwise.
+    """
+    previous = load_manifest(out_dir, manifest['name'])
+    if not previous or previous.get('hash') != manifest['hash'] or 'result' not in previous:
+        return None
+    for output in previous['result']['outputs']:
+        if not os.path.exists(os.path.join(out_dir, output)):
+            return None
+    return previous['result']
@@ -0,0 +1,102 @@
+"""
+Choose atlas page sizes per resource instead of always packing into 2048x2048.
+
+Every candidate maximum page size is packed, pages are optionally cropped to
+the area actually used (non power of two), and the candidate with the fewest
+texels, then the fewest pages, wins among those that need no more pages than
+a plain cap x cap packing. Every extra page is one more request and texture
+bind, fewer texels do not make up for it.
+"""
+from PyTexturePacker import Packer
+
+
+def candidate_sizes(cap):
+    """Square and 2:1 page limits from 256 up to cap, largest first."""
+    sizes = []
+    side = 256
+    while side <= cap:
+        sizes += [(side, side), (side, side // 2), (side // 2, side)]
+        side *= 2
+    if (cap, cap) not in sizes:
+        sizes.append((cap, cap))
+    return sorted(set(sizes), key=lambda s: (-s[0] * s[1], -s[0]))
+
+
+def used_size(atlas):
+    """Smallest page size that still holds every placed sprite plus the border padding."""
+    right = max(rect.right for rect in atlas.image_rect_list) + atlas.border_padding
+    bottom = max(rect.bottom for rect in atlas.image_rect_list) + atlas.border_padding
+    return right, bottom
+
+
+def pack(image_rects, max_size, bg_color, npot=False):
+    """
+    Pack with a maximum page size, cropping pages to their used area when npot is set.
+
+    Returns:
+        (packer, atlas list), or None when a sprite does not fit the page size
+    """
+    packer = Packer.create(max_width=max_size[0], max_height=max_size[1], bg_color=bg_color, trim_mode=1,
+                           enable_rotated=False)
+    try:
+        atlas_list = packer._pack(image_rects)
+    except (ValueError, AssertionError):
+        return None
+    # The packer opens pages up front from the total sprite area, some may stay empty
+    atlas_list = [atlas for atlas in atlas_list if atlas.image_rect_list]
+    if npot:
+        for atlas in atlas_list:
+            atlas.size = used_size(atlas)
+    return packer, atlas_list
+
+
+def stats(image_rects, atlas_list):
+    """Page sizes, packing efficiency and uncompressed RGBA texture memory of a packed resource."""
+    sprite_area = sum(rect.width * rect.height for rect in image_rects)
+    texels = sum(atlas.size[0] * atlas.size[1] for atlas in atlas_list)
+    return {
+        'pages': [list(atlas.size) for atlas in atlas_list],
+        'spriteArea': sprite_area,
+        'texels': texels,
+        'efficiency': round(sprite_area / float(texels), 3) if texels else 0,
+        'gpuBytes': texels * 4,
+    }
+
+
+def plan(image_rects, bg_color, cap=2048, max_pages=None, npot=True):
+    """
+    Pack a resource with the page size that needs the fewest texels.
+
+    Candidates with more than max_pages pages are skipped unless none fit,
+    max_pages defaults to the page count of the plain cap x cap packing.
+
+    Returns:
+        (packer, atlas list, plan) where plan holds the chosen maximum size,
+        its stats and the stats of a plain cap x cap packing for comparison
+    """
+    unpadded = pack(image_rects, (cap, cap), bg_color)
+    baseline = stats(image_rects, unpadded[1]) if unpadded else None
+    if max_pages is None and baseline is not None:
+        max_pages = len(baseline['pages'])
+
+    best = None
+    for size in candidate_sizes(cap):
+        packed = pack(image_rects, size, bg_color, npot)
+        if packed is None:
+            continue
+        result = stats(image_rects, packed[1])
+        over_budget = max_pages is not None and len(result['pages']) > max_pages
+        score = (over_budget, result['texels'], len(result['pages']))
+        if best is None or score < best[0]:
+            best = (score, size)
+
+    if best is None:
+        raise ValueError("Sprites do not fit in pages of %dx%d" % (cap, cap))
+
+    # The rects were moved by every trial, pack them again with the winner
+    packer, atlas_list = pack(image_rects, best[1], bg_color, npot)
+    return packer, atlas_list, {
+        'maxSize': list(best[1]),
+        'stats': stats(image_rects, atlas_list),
+        'baseline': baseline,
+    }
@@ -0,0 +1,347 @@
+"""
+Benchmark of the audio sprite build on synthetic clips.
+
+The sounds of the game come from the ISOs, so this generates a clip set
+that looks like them instead: mostly short 8-bit 11025/22050 Hz effects
+and voice lines, some 16-bit clips and a few long narrations and loops,
+with silence and DC padding around the audible part. The set depends only
+on the seed. Every configuration builds the same sprite and is timed per
+stage (load, concatenate, encode, json), recording wall time, peak RSS of
+the build and of ffmpeg, bytes written to the output and through write()
+and the realtime factor (seconds of audio per second of wall time). The
+JSON result can be compared with the result of another commit:
+
+    python -m build_scripts.audio_benchmark --out .build/audio-benchmark.json
+    python -m build_scripts.audio_benchmark --compare old.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import wave
+
+import numpy as np
+from pydub import AudioSegment
+
+from audiosprite import AudioSprite
+from audiosprite.audio_sprite import ffmpegVersion
+
+# Bump when the generated clips or the recorded stages change
+BENCHMARK_VERSION = 1
+
+# (rate, sample width, share of clips), after the sndS and snd members of the game
+CLIP_FORMATS = [(11025, 1, 0.45), (22050, 1, 0.35), (22050, 2, 0.2)]
+
+# Clip lengths are log-normal around this median, clamped to the range
+MEDIAN_SECONDS = 1.2
+SIGMA = 0.9
+MIN_SECONDS = 0.05
+MAX_SECONDS = 30.0
+
+# Share of clips that are long narrations, and their length range
+NARRATION_SHARE = 0.03
+NARRATION_SECONDS = (30.0, 120.0)
+
+LOOP_SHARE = 0.05
+
+AUDIO_SETTINGS = {'formats': ['ogg'], 'bitrate': '32k', 'parameters': ['-ar', '22050']}
+
+
+def clip_lengths(count, rng):
+    lengths = np.clip(rng.lognormal(np.log(MEDIAN_SECONDS), SIGMA, count), MIN_SECONDS, MAX_SECONDS)
+    narrations = rng.random_sample(count) < NARRATION_SHARE
+    lengths[narrations] = rng.uniform(NARRATION_SECONDS[0], NARRATION_SECONDS[1], narrations.sum())
+    return lengths
+
+
+def clip_samples(seconds, rate, rng):
+    """Float samples of a tone with harmonics and noise, with silence or DC padding around it."""
+    frames = max(1, int(seconds * rate))
+    t = np.arange(frames) / float(rate)
+    freq = rng.uniform(120, 900)
+    samples = sum(np.sin(2 * np.pi * freq * k * t + rng.uniform(0, 2 * np.pi)) / k for k in range(1, 5))
+    samples = samples * 0.25 + rng.normal(0, 0.02, frames)
+    samples *= np.minimum(1.0, np.minimum(t, t[-1] - t) / 0.01)
+    pad = int(rng.uniform(0, 0.3) * rate)
+    level = rng.choice([0.0, 0.0, 0.01])
+    return np.concatenate([np.full(pad, level), samples * rng.uniform(0.3, 1.0) + level, np.full(pad, level)])
+
+
+def write_wav(path, samples, rate, width):
+    if width == 1:
+        data = (np.clip(samples, -1, 1) * 127 + 128).astype(np.uint8).tobytes()
+    else:
+        data = (np.clip(samples, -1, 1) * 32767).astype('<i2').tobytes()
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(width)
+        w.setframerate(rate)
+        w.writeframes(data)
+
+
+def generate(folder, count, seed=0):
+    """
+    Write count WAV clips to folder.
+
+    Returns:
+        list of {'path', 'rate', 'width', 'seconds', 'loop', 'data'} as the
+        build adds them to a sprite
+    """
+    rng = np.random.RandomState(seed)
+    formats = [(rate, width) for rate, width, share in CLIP_FORMATS]
+    shares = [share for rate, width, share in CLIP_FORMATS]
+    clips = []
+    for i, seconds in enumerate(clip_lengths(count, rng)):
+        rate, width = formats[rng.choice(len(formats), p=shares)]
+        samples = clip_samples(seconds, rate, rng)
+        name = 'c%04d' % i
+        path = os.path.join(folder, name + '.wav')
+        write_wav(path, samples, rate, width)
+        clips.append({'path': path, 'rate': rate, 'width': width, 'seconds': len(samples) / float(rate),
+                      'loop': bool(rng.random_sample() < LOOP_SHARE),
+                      'data': {'dirFile': 'bench', 'dirNum': i, 'dirName': name}})
+    return clips
+
+
+def clip_summary(clips):
+    formats = {}
+    for clip in clips:
+        key = '%d/%d' % (clip['rate'], clip['width'] * 8)
+        formats[key] = formats.get(key, 0) + 1
+    seconds = sorted(clip['seconds'] for clip in clips)
+    return {
+        'count': len(clips),
+        'seconds': round(sum(seconds), 3),
+        'medianSeconds': round(seconds[len(seconds) // 2], 3),
+        'maxSeconds': round(seconds[-1], 3),
+        'bytes': sum(os.path.getsize(clip['path']) for clip in clips),
+        'formats': formats,
+    }
+
+
+def folder_bytes(folder):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, dirs, names in os.walk(folder) for name in names)
+
+
+def write_chars():
+    """Bytes passed to write() by this process and its finished children, pipes included, on Linux."""
+    try:
+        with open('/proc/self/io') as fp:
+            for line in fp:
+                if line.startswith('wchar:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss():
+    """Restart the peak RSS count of this process where the kernel allows it."""
+    try:
+        with open('/proc/self/clear_refs', 'w') as fp:
+            fp.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss():
+    """Peak RSS of this process in bytes, since reset_peak_rss() on Linux."""
+    try:
+        with open('/proc/self/status') as fp:
+            for line in fp:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # ru_maxrss is in KB on Linux and bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+
+
+class Stages(object):
+    """Records wall time, peak RSS and bytes written of each stage of a build."""
+
+    def __init__(self, out_dir, audio_seconds):
+        self.out_dir = out_dir
+        self.audio_seconds = audio_seconds
+        self.stages = {}
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        reset_peak_rss()
+        written = folder_bytes(self.out_dir)
+        chars = write_chars()
+        start = time.time()
+        yield
+        seconds = time.time() - start
+        scale = 1 if sys.platform == 'darwin' else 1024
+        self.stages[name] = {
+            'seconds': round(seconds, 4),
+            'peakRss': peak_rss(),
+            # Largest ffmpeg so far, the kernel keeps no per stage peak for children
+            'childPeakRss': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+            'bytesWritten': folder_bytes(self.out_dir) - written,
+            # Temporary files and the PCM piped to ffmpeg count here too
+            'writeChars': write_chars() - chars if chars is not None else None,
+            'realtimeFactor': round(self.audio_seconds / seconds, 2) if seconds > 0 else None,
+        }
+
+
+def build(clips, out_dir, layout='fixed', normalize=False, reference=False):
+    """
+    Build one sprite of all clips as assets.py does, stage by stage.
+
+    Returns:
+        {'layout', 'normalize', 'spriteSeconds', 'stages': {stage: stats}}
+    """
+    audio_seconds = sum(clip['seconds'] for clip in clips)
+    stages = Stages(out_dir, audio_seconds)
+    key = 'bench-%s%s-audio' % (layout, '-normalized' if normalize else '')
+    with contextlib.redirect_stdout(io.StringIO()):
+        sprite = AudioSprite('bench')
+        if layout == 'tight':
+            sprite.setGuardGap(AudioSprite.guardGap(AUDIO_SETTINGS['formats']))
+        if normalize:
+            sprite.setOutputRate(AudioSprite.outputRate(AUDIO_SETTINGS['formats'], AUDIO_SETTINGS['parameters']))
+
+        with stages.stage('load'):
+            for clip in clips:
+                sprite.addAudio(clip['path'], isLooped=clip['loop'], extraData=clip['data'])
+
+        if reference:
+            # The sprite as pydub's + joins it, copying everything joined so far for every clip
+            with stages.stage('pydubConcatenate'):
+                joined = AudioSegment.empty()
+                for f in sprite._files:
+                    joined += AudioSegment.silent(f['length']) if sprite._isSilence(f) else f['seg']
+                del joined
+
+        with stages.stage('concatenate'):
+            out = sprite._concatenate()
+
+        outputs = [(os.path.join(out_dir, key + '.' + fmt), fmt) for fmt in AUDIO_SETTINGS['formats']]
+        with stages.stage('encode'):
+            sprite._encode(out, outputs, AUDIO_SETTINGS['bitrate'], AUDIO_SETTINGS['parameters'], None, '4')
+
+        with stages.stage('json'):
+            sprite._generateDataFile(os.path.join(out_dir, key))
+
+    return {
+        'layout': layout,
+        'normalize': normalize,
+        'spriteSeconds': round(sprite.duration(), 3),
+        'stages': stages.stages,
+    }
+
+
+def git_commit():
+    try:
+        proc = subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)))
+    except OSError:
+        return None
+    return proc.stdout.decode('ascii').strip() or None
+
+
+def run(count, seed=0, layouts=('fixed',), normalize=(False,), reference=False, folder=None):
+    """Generate the clip set and build it with every layout and normalize setting."""
+    with tempfile.TemporaryDirectory(dir=folder) as work:
+        clip_dir = os.path.join(work, 'clips')
+        out_dir = os.path.join(work, 'out')
+        os.makedirs(clip_dir)
+        os.makedirs(out_dir)
+
+        start = time.time()
+        clips = generate(clip_dir, count, seed)
+        generated = time.time() - start
+
+        runs = []
+        for layout in layouts:
+            for norm in normalize:
+                runs.append(build(clips, out_dir, layout, norm, reference))
+
+        return {
+            'benchmark': BENCHMARK_VERSION,
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'ffmpeg': ffmpegVersion(),
+            'seed': seed,
+            'generateSeconds': round(generated, 3),
+            'clips': clip_summary(clips),
+            'runs': runs,
+        }
+
+
+def compare(old, new):
+    """Lines with the change of every stage of runs present in both results."""
+    lines = []
+    if old.get('clips') != new.get('clips'):
+        lines.append('clip sets differ, compare results of the same --clips and --seed')
+    old_runs = dict(((r['layout'], r['normalize']), r) for r in old['runs'])
+    for run_ in new['runs']:
+        before = old_runs.get((run_['layout'], run_['normalize']))
+        if before is None:
+            continue
+        for name, stats in run_['stages'].items():
+            if name not in before['stages']:
+                continue
+            was = before['stages'][name]
+            lines.append('%-6s %-10s %-17s %8.3fs -> %8.3fs (%+.0f%%)  peak RSS %6.1f -> %6.1f MB' % (
+                run_['layout'], 'normalized' if run_['normalize'] else '', name, was['seconds'], stats['seconds'],
+                (stats['seconds'] / was['seconds'] - 1) * 100 if was['seconds'] else 0,
+                was['peakRss'] / 1048576.0, stats['peakRss'] / 1048576.0))
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the audio sprite build on synthetic clips')
+    parser.add_argument('--clips', type=int, default=300, help='number of generated clips')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the generated clip set')
+    parser.add_argument('--layout', nargs='+', choices=['fixed', 'tight'], default=['fixed'],
+                        help='sprite layouts to build')
+    parser.add_argument('--normalize', action='store_true',
+                        help='also build with clips resampled once to the encoder rate')
+    parser.add_argument('--reference', action='store_true',
+                        help='also time joining the clips with pydub +, as the sprite used to be built')
+    parser.add_argument('--work-dir', default=None, help='folder for the generated clips and sprites')
+    parser.add_argument('--out', default=os.path.join('.build', 'audio-benchmark.json'),
+                        help='JSON result, empty to only print it')
+    parser.add_argument('--compare', default=None, metavar='JSON', help='result of an earlier run to compare with')
+    args = parser.parse_args(argv)
+
+    result = run(args.clips, args.seed, args.layout, [False, True] if args.normalize else [False],
+                 args.reference, args.work_dir)
+
+    if args.out:
+        if os.path.dirname(args.out) and not os.path.exists(os.path.dirname(args.out)):
+            os.makedirs(os.path.dirname(args.out))
+        with open(args.out, 'w') as fp:
+            json.dump(result, fp, indent=2)
+        print('Wrote ' + args.out)
+    else:
+        print(json.dumps(result, indent=2))
+
+    summary = result['clips']
+    print('%d clips, %.1f s of audio' % (summary['count'], summary['seconds']))
+    for run_ in result['runs']:
+        for name, stats in run_['stages'].items():
+            print('%-6s %-10s %-17s %8.3fs  %8sx realtime  peak RSS %6.1f MB  %d bytes written' % (
+                run_['layout'], 'normalized' if run_['normalize'] else '', name, stats['seconds'],
+                stats['realtimeFactor'], stats['peakRss'] / 1048576.0, stats['bytesWritten']))
+
+    if args.compare:
+        with open(args.compare) as fp:
+            for line in compare(json.load(fp), result):
+                print(line)
+
+
+if __name__ == '__main__':
+    main()
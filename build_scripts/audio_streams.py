@@ -0,0 +1,49 @@
+"""
+Split long clips out of audio sprites into files of their own.
+
+An audio sprite is decoded as a whole before any clip of it plays, so a
+two minute narration in the same sprite as a few clicks keeps all of it in
+memory for the whole scene. Clips longer than a threshold are written as
+separate files the game loads with autoDecode off and decodes on first
+play. A sprite keeps at least one clip, scenes call addAudio() on it.
+"""
+import re
+import wave
+
+# Web Audio keeps decoded audio as 32-bit float samples at the context rate
+DECODED_RATE = 48000
+DECODED_SAMPLE_BYTES = 4
+
+
+def clip_seconds(path):
+    with wave.open(path, 'rb') as w:
+        return w.getnframes() / float(w.getframerate())
+
+
+def split_streams(sounds, threshold):
+    """
+    Returns:
+        (sprite sounds, streamed sounds), sounds longer than threshold seconds
+        are streamed unless that would leave the sprite empty
+    """
+    if not threshold:
+        return sounds, []
+    streams = [s for s in sounds if clip_seconds(s['path']) > threshold]
+    if len(streams) == len(sounds):
+        return sounds, []
+    return [s for s in sounds if s not in streams], streams
+
+
+def stream_name(res_name, sound):
+    return '%s-stream-%s' % (res_name, re.sub(r'[^A-Za-z0-9_.-]', '_', sound['data']['dirName']))
+
+
+def sprite_seconds(sounds, silence=1.0):
+    """Length of a sprite of sounds with the fixed silence between clips."""
+    if len(sounds) == 0:
+        return 0
+    return sum(clip_seconds(s['path']) for s in sounds) + silence * (len(sounds) - 1)
+
+
+def decoded_bytes(seconds, channels=1):
+    return int(seconds * DECODED_RATE * channels * DECODED_SAMPLE_BYTES)
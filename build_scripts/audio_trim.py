@@ -0,0 +1,80 @@
+"""
+Level statistics and silence trimming of extracted sounds.
+
+Many Director sounds start or end with silence, some with padding at a
+constant non-zero (DC) level. That silence is encoded into the sprites and
+delays voice lines. analyse() finds peak, RMS, DC offset and the audible
+range of a clip in one pass over its samples; trimming keeps a few ms
+around the audible part. Cue points ([ms, name] from soundCuePoints) are
+shifted to the trimmed start.
+"""
+import math
+
+import numpy as np
+
+SAMPLE_TYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+
+# Deviation from the DC level below which a sample counts as silence
+SILENCE_DBFS = -60.0
+
+# Kept around the audible part, a hard cut at the first sample can click
+PAD_START_MS = 5
+PAD_END_MS = 20
+
+
+def dbfs(value):
+    return round(20 * math.log10(value), 2) if value > 0 else None
+
+
+def analyse(raw, sample_width, channels, frame_rate, silence_dbfs=SILENCE_DBFS):
+    """
+    Args:
+        raw: signed PCM bytes, as pydub keeps them
+
+    Returns:
+        {'frames', 'peak', 'rms' (dBFS), 'dc' (fraction of full scale),
+         'trim': [first frame, end frame] of the audible range plus padding}
+    """
+    samples = np.frombuffer(raw, dtype=SAMPLE_TYPES[sample_width]).reshape(-1, channels)
+    frames = len(samples)
+    if frames == 0:
+        return {'frames': 0, 'peak': None, 'rms': None, 'dc': 0.0, 'trim': [0, 0]}
+
+    full_scale = float(2 ** (8 * sample_width - 1))
+    values = samples.astype(np.float64) / full_scale
+    # Padding sits at the most common level, speech averages out around it
+    dc = float(np.median(values))
+    level = np.abs(values - dc).max(axis=1)
+
+    audible = np.flatnonzero(level > 10 ** (silence_dbfs / 20.0))
+    if len(audible) == 0:
+        trim = [0, frames]
+    else:
+        trim = [max(0, int(audible[0]) - frame_rate * PAD_START_MS // 1000),
+                min(frames, int(audible[-1]) + 1 + frame_rate * PAD_END_MS // 1000)]
+
+    return {
+        'frames': frames,
+        'peak': dbfs(float(np.abs(values).max())),
+        'rms': dbfs(float(np.sqrt(np.mean(np.square(values))))),
+        'dc': round(dc, 5),
+        'trim': trim,
+    }
+
+
+def shift_cues(cues, start_ms, length_ms):
+    """Cue points relative to a clip trimmed by start_ms, kept within its new length."""
+    shifted = []
+    for cue in cues:
+        if isinstance(cue, list):
+            shifted.append([min(max(0, cue[0] - start_ms), length_ms)] + cue[1:])
+        else:
+            shifted.append(min(max(0, cue - start_ms), length_ms))
+    return shifted
+
+
+def shift_clip_cues(clip, start_ms, length_ms):
+    """Shift the cue points of an added clip and of its aliases, they all play the trimmed region."""
+    for data in [clip['data']] + [alias['data'] for alias in clip['aliases']]:
+        if 'cue' in data:
+            data['cue'] = shift_cues(data['cue'], start_ms, length_ms)
@@ -0,0 +1,132 @@
+"""
+Columnar encoding of atlas and audio sprite JSON.
+
+The regular JSON repeats every key for every frame and clip. The compact
+form, written next to it as <name>.compact.json, stores one array per field
+and puts dirFile/dirName strings in a shared table:
+
+    atlas: {"v", "meta", "strings", "frames": {"key", "x", "y", "w", "h", "rx", "ry", "file", "name", "num"}}
+    audio: {"v", "resources", "strings", "clips": {"id", "start", "end", "loop", "file", "name", "num", "cue"}}
+
+decode_atlas() and decode_audio() (and src/util/compactMeta.js) give back
+the regular JSON.
+"""
+import json
+import os
+import time
+import zlib
+
+FORMAT_VERSION = 1
+
+
+class StringTable(object):
+
+    def __init__(self):
+        self.values = []
+        self.indices = {}
+
+    def add(self, value):
+        if value not in self.indices:
+            self.indices[value] = len(self.values)
+            self.values.append(value)
+        return self.indices[value]
+
+
+def encode_atlas(atlas):
+    strings = StringTable()
+    columns = dict((name, []) for name in ['key', 'x', 'y', 'w', 'h', 'rx', 'ry', 'file', 'name', 'num'])
+    for key, frame in atlas['frames'].items():
+        columns['key'].append(key)
+        for name in ['x', 'y', 'w', 'h']:
+            columns[name].append(frame['frame'][name])
+        columns['rx'].append(frame['regpoint']['x'])
+        columns['ry'].append(frame['regpoint']['y'])
+        columns['file'].append(strings.add(frame['dirFile']))
+        columns['name'].append(strings.add(frame['dirName']))
+        columns['num'].append(frame['dirNum'])
+    return {'v': FORMAT_VERSION, 'meta': atlas['meta'], 'strings': strings.values, 'frames': columns}
+
+
+def decode_atlas(data):
+    strings = data['strings']
+    columns = data['frames']
+    frames = {}
+    for i, key in enumerate(columns['key']):
+        frames[key] = {
+            'frame': {'x': columns['x'][i], 'y': columns['y'][i], 'w': columns['w'][i], 'h': columns['h'][i]},
+            'regpoint': {'x': columns['rx'][i], 'y': columns['ry'][i]},
+            'dirFile': strings[columns['file'][i]],
+            'dirName': strings[columns['name'][i]],
+            'dirNum': columns['num'][i],
+        }
+    return {'frames': frames, 'meta': data['meta']}
+
+
+def encode_audio(sprite):
+    strings = StringTable()
+    columns = dict((name, []) for name in ['id', 'start', 'end', 'loop', 'file', 'name', 'num', 'cue'])
+    for clip, entry in sprite['spritemap'].items():
+        data = entry['data']
+        columns['id'].append(strings.add(clip))
+        columns['start'].append(entry['start'])
+        columns['end'].append(entry['end'])
+        columns['loop'].append(1 if entry['loop'] else 0)
+        columns['file'].append(strings.add(data['dirFile']))
+        columns['name'].append(strings.add(data['dirName']))
+        columns['num'].append(data['dirNum'])
+        columns['cue'].append(data.get('cue'))
+    if not any(cue is not None for cue in columns['cue']):
+        del columns['cue']
+    return {'v': FORMAT_VERSION, 'resources': sprite['resources'], 'strings': strings.values, 'clips': columns}
+
+
+def decode_audio(data):
+    strings = data['strings']
+    columns = data['clips']
+    spritemap = {}
+    for i, clip in enumerate(columns['id']):
+        extra = {
+            'dirName': strings[columns['name'][i]],
+            'dirFile': strings[columns['file'][i]],
+            'dirNum': columns['num'][i],
+        }
+        if 'cue' in columns and columns['cue'][i] is not None:
+            extra['cue'] = columns['cue'][i]
+        spritemap[strings[clip]] = {
+            'start': columns['start'][i],
+            'end': columns['end'][i],
+            'loop': bool(columns['loop'][i]),
+            'data': extra,
+        }
+    return {'resources': data['resources'], 'spritemap': spritemap}
+
+
+def compact_path(path):
+    return os.path.splitext(path)[0] + '.compact.json'
+
+
+def _parse_time(text, decode=None, repeat=5):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        value = json.loads(text)
+        if decode:
+            decode(value)
+    return (time.perf_counter() - start) / repeat
+
+
+def write_compact(path, kind):
+    """
+    Write the compact form of the atlas or audio JSON at path.
+
+    Returns:
+        [json bytes, compact bytes, json gzip bytes, compact gzip bytes,
+         json parse seconds, compact parse and decode seconds]
+    """
+    encode, decode = {'atlas': (encode_atlas, decode_atlas), 'audio': (encode_audio, decode_audio)}[kind]
+    with open(path) as fp:
+        text = fp.read()
+    compact = json.dumps(encode(json.loads(text)), separators=(',', ':'))
+    with open(compact_path(path), 'w') as fp:
+        fp.write(compact)
+    return [len(text), len(compact), len(zlib.compress(text.encode('utf-8'), 9)),
+            len(zlib.compress(compact.encode('utf-8'), 9)), _parse_time(text), _parse_time(compact, decode)]
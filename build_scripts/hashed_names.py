@@ -0,0 +1,120 @@
+"""
+Content-hashed copies of the files the asset packs reference.
+
+Every atlas page, atlas JSON and audio sprite a pack points to gets a copy
+named <name>.<hash>.<ext>, and the pack is rewritten to use it, so the server
+can cache those files forever. The packs and index.json keep their names,
+scenes load them by name. manifest.json maps every logical file to its hashed
+copy with its size and a subresource integrity hash, the packs and index.json
+are listed under their own names.
+"""
+import base64
+import hashlib
+import json
+import os
+import re
+
+HASH_LENGTH = 10
+HASHED_NAME = re.compile(r'\.[0-9a-f]{%d}\.[a-z0-9]+$' % HASH_LENGTH)
+
+
+def digest(data):
+    """(short hex hash for file names, SRI integrity string)"""
+    sha = hashlib.sha384(data)
+    return sha.hexdigest()[:HASH_LENGTH], 'sha384-' + base64.b64encode(sha.digest()).decode('ascii')
+
+
+def hashed_name(name, short_hash):
+    base, ext = os.path.splitext(name)
+    return '%s.%s%s' % (base, short_hash, ext)
+
+
+def rewrite(value, urls):
+    """Replace every string in a JSON value that is a key of urls."""
+    if isinstance(value, dict):
+        return dict((key, rewrite(item, urls)) for key, item in value.items())
+    if isinstance(value, list):
+        return [rewrite(item, urls) for item in value]
+    if isinstance(value, str):
+        return urls.get(value, value)
+    return value
+
+
+def referenced_urls(value, web_path):
+    """Every string in a JSON value that points into web_path."""
+    if isinstance(value, dict):
+        value = list(value.values())
+    if isinstance(value, list):
+        found = []
+        for item in value:
+            found += referenced_urls(item, web_path)
+        return found
+    if isinstance(value, str) and value.startswith(web_path + '/'):
+        return [value]
+    return []
+
+
+def _write(path, data):
+    # Copies, not hard links: the build rewrites the unhashed files in place
+    if os.path.exists(path):
+        return
+    with open(path + '.tmp', 'wb') as out:
+        out.write(data)
+    os.replace(path + '.tmp', path)
+
+
+def publish(out_dir, web_path, pack_names):
+    """
+    Write hashed copies of everything the packs reference, point the packs at
+    them and write manifest.json. Hashed files no longer referenced are removed.
+
+    Returns:
+        the manifest, logical name -> {'file', 'bytes', 'integrity'}
+    """
+    packs = {}
+    for name in pack_names:
+        with open(os.path.join(out_dir, name + '.json')) as fp:
+            packs[name] = json.load(fp)
+
+    references = set()
+    for pack in packs.values():
+        references.update(referenced_urls(pack, web_path))
+
+    def local(url):
+        return os.path.join(out_dir, url[len(web_path) + 1:])
+
+    manifest = {}
+    urls = {}
+
+    def add(url, data):
+        short_hash, integrity = digest(data)
+        name = hashed_name(os.path.basename(url), short_hash)
+        _write(os.path.join(out_dir, name), data)
+        manifest[os.path.basename(url)] = {'file': name, 'bytes': len(data), 'integrity': integrity}
+        urls[url] = web_path + '/' + name
+
+    # Binary files first, the atlas and audio JSON reference them
+    json_urls = sorted(url for url in references if url.endswith('.json'))
+    for url in sorted(references - set(json_urls)):
+        with open(local(url), 'rb') as fp:
+            data = fp.read()
+        add(url, data)
+
+    for url in json_urls:
+        with open(local(url)) as fp:
+            add(url, json.dumps(rewrite(json.load(fp), urls)).encode('utf-8'))
+
+    for name, pack in packs.items():
+        data = json.dumps(rewrite(pack, urls)).encode('utf-8')
+        with open(os.path.join(out_dir, name + '.json'), 'wb') as fp:
+            fp.write(data)
+        manifest[name + '.json'] = {'file': name + '.json', 'bytes': len(data), 'integrity': digest(data)[1]}
+
+    current = set(entry['file'] for entry in manifest.values())
+    for name in os.listdir(out_dir):
+        if HASHED_NAME.search(name) and name not in current:
+            os.remove(os.path.join(out_dir, name))
+
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as fp:
+        json.dump(manifest, fp, indent=1, sort_keys=True)
+    return manifest
@@ -0,0 +1,104 @@
+"""
+Alternative encodings of atlas pages, written next to the PNG so the game
+can load the smallest format the browser supports.
+"""
+import hashlib
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor
+
+from PIL import Image
+from PIL import features
+
+ENCODER_VERSION = 1
+
+# exact=True keeps the RGB of fully transparent pixels, the edge bleeding of
+# convert_image() relies on it to avoid dark fringes with bilinear filtering.
+# AVIF has no lossless RGB mode in Pillow, 4:4:4 at quality 100 is the closest.
+ENCODERS = {
+    'webp': ('WEBP', {'lossless': True, 'quality': 100, 'method': 6, 'exact': True}),
+    'avif': ('AVIF', {'quality': 100, 'subsampling': '4:4:4', 'speed': 4}),
+}
+
+# Standalone backgrounds are opaque painted scenes, a lossy encode is a
+# fraction of the PNG. The quality comes from the command line.
+LOSSY_ENCODERS = {
+    'jpg': ('JPEG', {'optimize': True, 'progressive': True}),
+    'webp': ('WEBP', {'method': 6}),
+    'avif': ('AVIF', {'speed': 4}),
+}
+
+
+def available_formats(formats):
+    """Drop formats the installed Pillow can't write."""
+    return [fmt for fmt in formats if features.check(fmt)]
+
+
+def encode_file(path, fmt, cache_dir=None):
+    """
+    Write path (a PNG) as fmt next to it, reusing a cached encode of the same page.
+
+    Returns:
+        (format, output path, bytes)
+    """
+    out_path = os.path.splitext(path)[0] + '.' + fmt
+    cached = None
+    if cache_dir:
+        digest = hashlib.sha1()
+        with open(path, 'rb') as fp:
+            digest.update(fp.read())
+        digest.update(('%s-%d' % (fmt, ENCODER_VERSION)).encode('ascii'))
+        cached = os.path.join(cache_dir, digest.hexdigest() + '.' + fmt)
+        if os.path.exists(cached):
+            shutil.copyfile(cached, out_path)
+            return fmt, out_path, os.path.getsize(out_path)
+
+    pil_format, options = ENCODERS[fmt]
+    with Image.open(path) as image:
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        image.save(out_path + '.tmp', pil_format, **options)
+    os.replace(out_path + '.tmp', out_path)
+
+    if cached:
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        shutil.copyfile(out_path, cached + '.%d' % os.getpid())
+        os.replace(cached + '.%d' % os.getpid(), cached)
+
+    return fmt, out_path, os.path.getsize(out_path)
+
+
+def encode_lossy(path, out_base, fmt, quality):
+    """
+    Write the opaque image at path as out_base.fmt with a lossy encoder.
+
+    Returns:
+        (format, output path, bytes)
+    """
+    out_path = out_base + '.' + fmt
+    pil_format, options = LOSSY_ENCODERS[fmt]
+    with Image.open(path) as image:
+        image.convert('RGB').save(out_path + '.tmp', pil_format, quality=quality, **options)
+    os.replace(out_path + '.tmp', out_path)
+    return fmt, out_path, os.path.getsize(out_path)
+
+
+def encode_files(paths, formats, cache_dir=None, jobs=1, mp_context=None):
+    """
+    Encode every PNG in paths to every format, in a process pool when jobs > 1.
+
+    Returns:
+        dict of path -> list of (format, output path, bytes)
+    """
+    tasks = [(path, fmt) for path in paths for fmt in formats]
+    if jobs <= 1 or len(tasks) <= 1:
+        done = [encode_file(path, fmt, cache_dir) for path, fmt in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=jobs, mp_context=mp_context) as pool:
+            futures = [pool.submit(encode_file, path, fmt, cache_dir) for path, fmt in tasks]
+            done = [future.result() for future in futures]
+    encoded = dict((path, []) for path in paths)
+    for (path, fmt), result in zip(tasks, done):
+        encoded[path].append(result)
+    return encoded
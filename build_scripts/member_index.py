@@ -0,0 +1,66 @@
+"""
+Reverse lookup from Director members to the frames and clips they ended up in.
+
+Members are referenced as "dirFile/dirNum" (e.g. "03.DXR/33"). Each resource
+gets <name>-members.json, loaded with its pack, covering every atlas page,
+audio sprite and streamed clip the pack lists, shared pages included:
+
+    images: ref -> [[atlas key, frame key, width, height], ...]
+    sounds: ref -> [[audio sprite or stream key, clip id], ...]
+    names:  dirName -> [ref, ...]
+
+members.json merges the resources' own entries for tools, with the resource
+name in front of every frame and clip.
+"""
+import json
+import os
+
+
+def member_ref(data):
+    return '%s/%s' % (data['dirFile'], data['dirNum'])
+
+
+def _add(table, key, value):
+    values = table.setdefault(key, [])
+    if value not in values:
+        values.append(value)
+
+
+def build_index(out_dir, web_path, entries):
+    """Index the atlas and audio sprite entries of a pack, reading their JSON from out_dir."""
+    def load(url):
+        with open(os.path.join(out_dir, url[len(web_path) + 1:])) as fp:
+            return json.load(fp)
+
+    index = {'images': {}, 'sounds': {}, 'names': {}}
+    for item in entries:
+        if item['type'] == 'atlasJSONHash':
+            atlas = item['atlasData'] or load(item['atlasURL'])
+            for name, frame in atlas['frames'].items():
+                ref = member_ref(frame)
+                _add(index['images'], ref, [item['key'], name, frame['frame']['w'], frame['frame']['h']])
+                _add(index['names'], frame['dirName'], ref)
+        elif item['type'] == 'audiosprite' or (item['type'] == 'audio' and item.get('jsonURL')):
+            # Streamed clips (assets.py --stream-audio) are one clip files with sprite JSON
+            for clip, sprite in load(item['jsonURL'])['spritemap'].items():
+                data = sprite.get('data')
+                if not data:
+                    continue
+                ref = member_ref(data)
+                _add(index['sounds'], ref, [item['key'], clip])
+                _add(index['names'], data['dirName'], ref)
+    return index
+
+
+def merge_indexes(indexes):
+    """Global index from resource name -> index."""
+    merged = {'images': {}, 'sounds': {}, 'names': {}}
+    for name, index in indexes.items():
+        for kind in ['images', 'sounds']:
+            for ref, values in index[kind].items():
+                for value in values:
+                    _add(merged[kind], ref, [name] + value)
+        for dirName, refs in index['names'].items():
+            for ref in refs:
+                _add(merged['names'], dirName, ref)
+    return merged
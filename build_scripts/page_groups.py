@@ -0,0 +1,140 @@
+"""
+Keep sprites that are used together on the same atlas page.
+
+Two kinds of usage group are known at build time: the actions of an
+animation chart (frames are offsets from the member after the chart) and
+the members a scene sets with setDirectorMember(). Every sprite is assigned
+to the smallest group it belongs to, groups are spread over pages by area
+(first fit, largest first) and each page's share is packed on its own.
+"""
+import glob
+import os
+import re
+from collections import OrderedDict
+
+from PyTexturePacker import Packer
+
+SET_DIRECTOR_MEMBER = re.compile(r"setDirectorMember\(\s*['\"]([^'\"]+)['\"]\s*,\s*([0-9]+)\s*\)")
+
+
+def scene_groups(scenes_dir):
+    """Scene file name -> set of (dirFile, dirNum) it passes to setDirectorMember()."""
+    groups = OrderedDict()
+    for path in sorted(glob.glob(os.path.join(scenes_dir, '*.js'))):
+        with open(path, encoding='utf-8', errors='ignore') as fp:
+            refs = set((m.group(1), int(m.group(2))) for m in SET_DIRECTOR_MEMBER.finditer(fp.read()))
+        if refs:
+            groups['scene:' + os.path.basename(path)] = refs
+    return groups
+
+
+def _chart_members(frames, first):
+    members = set()
+    for frame in frames:
+        if isinstance(frame, int):
+            members.add(first + frame)
+        elif isinstance(frame, dict):
+            for arg in frame['arguments']:
+                values = arg if isinstance(arg, list) else [arg]
+                members.update(first + value for value in values if isinstance(value, int))
+    return members
+
+
+def animation_groups(animations):
+    """One group per action of every animation chart of a resource."""
+    groups = OrderedDict()
+    for dir_file, charts in animations.items():
+        for num, actions in charts.items():
+            for action, frames in actions.items():
+                refs = set((dir_file, member) for member in _chart_members(frames, int(num)))
+                if refs:
+                    groups['animation:%s/%s/%s' % (dir_file, num, action)] = refs
+    return groups
+
+
+def rect_refs(rect):
+    refs = [(rect.dirFile, rect.dirNum)] + [(dupe['dirFile'], dupe['dirNum']) for dupe in rect.dupes]
+    # Scenes of the boat game pass dirFile without the boten_ prefix
+    return set(refs + [(d[6:], n) for d, n in refs if d.startswith('boten_')])
+
+
+def _area(rect):
+    return (rect.width + 2) * (rect.height + 2)
+
+
+def partition(image_rects, groups, capacity):
+    """Split the rects into page-sized lists that keep usage groups together."""
+    by_ref = {}
+    for rect in image_rects:
+        for ref in rect_refs(rect):
+            by_ref.setdefault(ref, []).append(rect)
+
+    # Larger groups first so the smallest group a rect is in wins
+    owner = {}
+    for key, refs in sorted(groups.items(), key=lambda g: -len(g[1])):
+        for ref in refs:
+            for rect in by_ref.get(ref, []):
+                owner[id(rect)] = key
+
+    clusters = OrderedDict()
+    free = []
+    for rect in image_rects:
+        if id(rect) in owner:
+            clusters.setdefault(owner[id(rect)], []).append(rect)
+        else:
+            free.append(rect)
+
+    chunks = []
+    for rects in sorted(clusters.values(), key=lambda r: -sum(_area(rect) for rect in r)):
+        chunk = []
+        for rect in sorted(rects, key=_area, reverse=True):
+            if chunk and sum(_area(r) for r in chunk) + _area(rect) > capacity:
+                chunks.append(chunk)
+                chunk = []
+            chunk.append(rect)
+        chunks.append(chunk)
+    chunks += [[rect] for rect in sorted(free, key=_area, reverse=True)]
+
+    bins = []
+    for chunk in chunks:
+        area = sum(_area(rect) for rect in chunk)
+        for page in bins:
+            if page[0] + area <= capacity:
+                page[0] += area
+                page[1].extend(chunk)
+                break
+        else:
+            bins.append([area, list(chunk)])
+    return [rects for area, rects in bins]
+
+
+def pack_grouped(image_rects, groups, max_size, bg_color, fill=0.8):
+    """
+    Pack each partition separately. fill is the share of a page the
+    partitions are planned to use, MaxRects rarely reaches a full page.
+
+    Returns:
+        (packer, atlas list)
+    """
+    packer = None
+    atlas_list = []
+    for rects in partition(image_rects, groups, max_size * max_size * fill):
+        packer = Packer.create(max_width=max_size, max_height=max_size, bg_color=bg_color, trim_mode=1,
+                               enable_rotated=False)
+        atlas_list += [atlas for atlas in packer._pack(rects) if atlas.image_rect_list]
+    return packer, atlas_list
+
+
+def pages_touched(groups, atlas_list):
+    """Average number of pages the members of a group are spread over, for groups present on the pages."""
+    page_of = {}
+    for i, atlas in enumerate(atlas_list):
+        for rect in atlas.image_rect_list:
+            for ref in rect_refs(rect):
+                page_of[ref] = i
+    counts = []
+    for refs in groups.values():
+        pages = set(page_of[ref] for ref in refs if ref in page_of)
+        if pages:
+            counts.append(len(pages))
+    return round(sum(counts) / float(len(counts)), 2) if counts else 0
@@ -0,0 +1,65 @@
+"""
+Find members that are the same 8-bit bitmap drawn with different palettes.
+
+Summer/winter boat casts and colour-swapped sails share their index data
+and only differ in palette. Each variant is expanded to RGBA and packed on
+its own today; stored once as an index texture with one palette row per
+variant they would cost a single 8-bit image plus 1 KB per palette.
+"""
+import hashlib
+from collections import OrderedDict
+
+from PIL import Image
+
+PALETTE_ROW_BYTES = 256 * 4
+
+
+def bitmap_keys(path):
+    """
+    Returns:
+        (hash of the size and index data, hash of the palette), or None for
+        bitmaps that are not palettized
+    """
+    with Image.open(path) as image:
+        if image.mode != 'P':
+            return None
+        indices = hashlib.sha1(('%dx%d' % image.size).encode('ascii') + image.tobytes()).hexdigest()
+        palette = hashlib.sha1(bytes(image.getpalette() or [])).hexdigest()
+    return indices, palette
+
+
+def find_palette_variants(resources):
+    """
+    Group the members of all resources by index data.
+
+    Returns:
+        list of groups with at least two palettes, each
+        {'size': [w, h], 'palettes': number of palettes, 'members': [[resource, dirFile, dirNum, palette], ...]}
+    """
+    groups = OrderedDict()
+    seen = set()
+    for resource in resources:
+        for image in resource['images']:
+            member = (image['dirFile'], image['dirNum'])
+            if member in seen:
+                continue
+            seen.add(member)
+            keys = bitmap_keys(image['bmp'])
+            if keys is None:
+                continue
+            group = groups.setdefault(keys[0], {'size': [image['width'], image['height']], 'members': []})
+            group['members'].append([resource['name'], image['dirFile'], image['dirNum'], keys[1]])
+
+    variants = []
+    for group in groups.values():
+        palettes = set(member[3] for member in group['members'])
+        if len(palettes) > 1:
+            group['palettes'] = len(palettes)
+            variants.append(group)
+    return variants
+
+
+def variant_savings(group):
+    """Bytes saved by storing a group as one 8-bit index texture plus palette rows instead of RGBA per palette."""
+    width, height = group['size']
+    return group['palettes'] * width * height * 4 - (width * height + group['palettes'] * PALETTE_ROW_BYTES)
@@ -38,10 +38,26 @@ for js_file in JS_SCENES_DIR.glob('*.js'):
         line_num = text[:m.start()].count('\n') + 1
         js_bg_lines.append((js_file.name, line_num, dir_file, dir_num))
 
+
+def background_atlases():
+    """Atlas JSON files with background-sized frames, from members.json when the build wrote one."""
+    index_path = DIST / 'members.json'
+    if not index_path.exists():
+        return sorted(DIST.glob('*sprites-*.json'))
+    index = json.loads(index_path.read_text(encoding='utf-8'))
+    pages = set()
+    for entries in index.get('images', {}).values():
+        for _res, page, _frame, w, h in entries:
+            if w >= MIN_W and h >= MIN_H:
+                pages.add(page)
+    # Standalone backgrounds (assets.py --backgrounds) have no atlas JSON
+    return sorted(DIST / (page + '.json') for page in pages if (DIST / (page + '.json')).exists())
+
+
 # Export frames
 items = []
 
-atlas_jsons = sorted(DIST.glob('*sprites-*.json'))
+atlas_jsons = background_atlases()
 for atlas_json in atlas_jsons:
     try:
         atlas = json.loads(atlas_json.read_text(encoding='utf-8'))
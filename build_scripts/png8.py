@@ -0,0 +1,71 @@
+"""
+Palette-indexed (PNG8) atlas pages.
+
+Director bitmaps are 8-bit, so a page whose sprites share one palette has at
+most 256 visible colors. Fully transparent pixels keep the RGB that
+convert_image() bled in from their neighbors; they get transparent palette
+entries of their own, and when there are more of those colors than free
+entries the rarest ones are mapped to the nearest transparent entry.
+"""
+import numpy as np
+from PIL import Image
+
+
+def _unique_colors(pixels):
+    """Unique uint32 colors of an (n, channels) uint8 array, with inverse indices and counts."""
+    packed = np.zeros(len(pixels), dtype=np.uint32)
+    for channel in range(pixels.shape[1]):
+        packed = (packed << 8) | pixels[:, channel]
+    return np.unique(packed, return_inverse=True, return_counts=True)
+
+
+def _unpack(colors, channels):
+    return np.stack([(colors >> (8 * (channels - 1 - c))) & 0xff for c in range(channels)], axis=1).astype(np.uint8)
+
+
+def to_png8(image):
+    """
+    Palettize an RGBA page without changing any visible pixel.
+
+    Returns:
+        a P image with the alpha of each entry in info['transparency'], or
+        None when the page has more than 256 visible colors (or no entry is
+        left for transparent pixels)
+    """
+    rgba = np.asarray(image.convert('RGBA')).reshape(-1, 4)
+    visible = rgba[:, 3] > 0
+
+    colors, visible_index, _ = _unique_colors(rgba[visible])
+    spare = 256 - len(colors)
+    if spare < 0 or (spare == 0 and not visible.all()):
+        return None
+
+    # Transparent entries go first so the tRNS chunk stops after them
+    indices = np.zeros(len(rgba), dtype=np.uint8)
+    palette = _unpack(colors, 4)
+    offset = 0
+
+    if not visible.all():
+        hidden, hidden_index, counts = _unique_colors(rgba[~visible][:, :3])
+        hidden_rgb = _unpack(hidden, 3)
+        if len(hidden) > spare:
+            keep = np.argsort(-counts, kind='stable')[:spare]
+            nearest = np.empty(len(hidden), dtype=np.intp)
+            for start in range(0, len(hidden), 4096):
+                chunk = hidden_rgb[start:start + 4096, None, :].astype(np.int32)
+                nearest[start:start + 4096] = ((chunk - hidden_rgb[keep][None, :, :]) ** 2).sum(axis=2).argmin(axis=1)
+            hidden_index = nearest[hidden_index]
+            hidden_rgb = hidden_rgb[keep]
+        indices[~visible] = hidden_index
+        offset = len(hidden_rgb)
+        palette = np.concatenate([np.concatenate([hidden_rgb, np.zeros((offset, 1), dtype=np.uint8)], axis=1),
+                                  palette])
+
+    indices[visible] = offset + visible_index
+
+    out = Image.fromarray(indices.reshape(image.size[1], image.size[0]), 'P')
+    out.putpalette(palette[:, :3].tobytes())
+    alpha = palette[:, 3].tobytes().rstrip(b'\xff')
+    if alpha:
+        out.info['transparency'] = alpha
+    return out
@@ -0,0 +1,188 @@
+"""
+Lossless PNG recompression for atlas pages.
+
+Replaces running optipng once per page: pages are re-encoded in-process with
+a search over PNG scanline filters and zlib settings, in a worker pool, and
+the result is cached by the hash of the unoptimized page plus the settings.
+"""
+import hashlib
+import os
+import shutil
+import struct
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from PIL import Image
+
+# Bump when the encoder output changes, so cached pages are not reused.
+OPTIMIZER_VERSION = 1
+
+MODES = {
+    # A couple of candidates that win on nearly every atlas page.
+    'fast': {
+        'filters': ['none', 'adaptive'],
+        'zlib': [(9, zlib.Z_DEFAULT_STRATEGY), (9, zlib.Z_FILTERED)],
+    },
+    # Every filter and strategy combination, like optipng -o7.
+    'max': {
+        'filters': ['none', 'sub', 'up', 'average', 'paeth', 'adaptive'],
+        'zlib': [(9, zlib.Z_DEFAULT_STRATEGY), (9, zlib.Z_FILTERED), (9, zlib.Z_RLE)],
+    },
+}
+
+FILTER_TYPES = {'none': 0, 'sub': 1, 'up': 2, 'average': 3, 'paeth': 4}
+
+COLOR_TYPES = {'L': 0, 'RGB': 2, 'P': 3, 'LA': 4, 'RGBA': 6}
+
+
+def _filter_rows(rows, bpp):
+    """
+    Apply all five PNG filters to every scanline at once.
+
+    Encoding filters only look at the unfiltered bytes, so they vectorize
+    over the whole image.
+
+    Returns:
+        dict of filter name -> uint8 array with the same shape as rows
+    """
+    x = rows.astype(np.int16)
+    a = np.zeros_like(x)
+    a[:, bpp:] = x[:, :-bpp]
+    b = np.zeros_like(x)
+    b[1:] = x[:-1]
+    c = np.zeros_like(x)
+    c[1:, bpp:] = x[:-1, :-bpp]
+
+    p = a + b - c
+    pa = np.abs(p - a)
+    pb = np.abs(p - b)
+    pc = np.abs(p - c)
+    paeth = np.where((pa <= pb) & (pa <= pc), a, np.where(pb <= pc, b, c))
+
+    return {
+        'none': rows,
+        'sub': (x - a).astype(np.uint8),
+        'up': (x - b).astype(np.uint8),
+        'average': (x - ((a + b) >> 1)).astype(np.uint8),
+        'paeth': (x - paeth).astype(np.uint8),
+    }
+
+
+def _filtered_stream(filtered, name):
+    """Raw IDAT data (filter type byte + filtered scanline) for one filter strategy."""
+    if name == 'adaptive':
+        # Per row, the filter with the smallest sum of absolute signed bytes
+        names = list(FILTER_TYPES)
+        costs = np.stack([np.abs(filtered[n].view(np.int8).astype(np.int32)).sum(axis=1) for n in names])
+        best = costs.argmin(axis=0)
+        data = np.choose(best[:, None], [filtered[n] for n in names])
+        types = np.array([FILTER_TYPES[n] for n in names], dtype=np.uint8)[best]
+    else:
+        data = filtered[name]
+        types = np.full(data.shape[0], FILTER_TYPES[name], dtype=np.uint8)
+    return np.hstack([types[:, None], data]).tobytes()
+
+
+def _chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+
+def encode_png(image, mode='fast'):
+    """
+    Encode a PIL image as PNG, picking the smallest of the candidate filters
+    and zlib settings of the mode.
+
+    Fully opaque RGBA images are stored as RGB.
+    """
+    settings = MODES[mode]
+
+    if image.mode == 'RGBA' and image.getextrema()[3][0] == 255:
+        image = image.convert('RGB')
+    if image.mode not in COLOR_TYPES:
+        image = image.convert('RGBA')
+
+    pixels = np.asarray(image, dtype=np.uint8)
+    height, width = pixels.shape[0], pixels.shape[1]
+    bpp = 1 if pixels.ndim == 2 else pixels.shape[2]
+    rows = pixels.reshape(height, width * bpp)
+
+    filtered = _filter_rows(rows, bpp)
+    best = None
+    for name in settings['filters']:
+        stream = _filtered_stream(filtered, name)
+        for level, strategy in settings['zlib']:
+            compressor = zlib.compressobj(level, zlib.DEFLATED, 15, 9, strategy)
+            data = compressor.compress(stream) + compressor.flush()
+            if best is None or len(data) < len(best):
+                best = data
+
+    chunks = [_chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, COLOR_TYPES[image.mode], 0, 0, 0))]
+    if image.mode == 'P':
+        palette = image.getpalette()
+        chunks.append(_chunk(b'PLTE', bytes(palette)))
+        transparency = image.info.get('transparency')
+        if isinstance(transparency, int):
+            transparency = bytes([255] * transparency + [0])
+        if transparency:
+            chunks.append(_chunk(b'tRNS', bytes(transparency)))
+    chunks.append(_chunk(b'IDAT', best))
+    chunks.append(_chunk(b'IEND', b''))
+
+    return b'\x89PNG\r\n\x1a\n' + b''.join(chunks)
+
+
+def cache_key(data, mode):
+    digest = hashlib.sha1(data)
+    digest.update(('%s-%d' % (mode, OPTIMIZER_VERSION)).encode('ascii'))
+    return digest.hexdigest()
+
+
+def optimize_file(path, mode='fast', cache_dir=None):
+    """
+    Recompress a PNG in place. The original is kept when it is already smaller.
+
+    Returns:
+        (path, bytes before, bytes after, True if the result came from the cache)
+    """
+    with open(path, 'rb') as fp:
+        original = fp.read()
+
+    cached = None
+    if cache_dir:
+        cached = os.path.join(cache_dir, cache_key(original, mode) + '.png')
+        if os.path.exists(cached):
+            shutil.copyfile(cached, path)
+            return path, len(original), os.path.getsize(path), True
+
+    with Image.open(path) as image:
+        image.load()
+        optimized = encode_png(image, mode)
+    if len(optimized) >= len(original):
+        optimized = original
+
+    with open(path + '.tmp', 'wb') as fp:
+        fp.write(optimized)
+    os.replace(path + '.tmp', path)
+
+    if cached:
+        if not os.path.exists(cache_dir):
+            os.makedirs(cache_dir, exist_ok=True)
+        shutil.copyfile(path, cached + '.%d' % os.getpid())
+        os.replace(cached + '.%d' % os.getpid(), cached)
+
+    return path, len(original), len(optimized), False
+
+
+def optimize_files(paths, mode='fast', cache_dir=None, jobs=1, mp_context=None):
+    """
+    Optimize several PNG files, in a process pool when jobs > 1.
+
+    Returns:
+        list of optimize_file() results in the order of paths
+    """
+    if jobs <= 1 or len(paths) <= 1:
+        return [optimize_file(path, mode, cache_dir) for path in paths]
+    with ProcessPoolExecutor(max_workers=jobs, mp_context=mp_context) as pool:
+        futures = [pool.submit(optimize_file, path, mode, cache_dir) for path in paths]
+        return [future.result() for future in futures]
@@ -0,0 +1,46 @@
+"""
+Split resources into a critical pack, loaded before the scene starts, and a
+deferred pack loaded in the background once it runs.
+
+The score data decides what is deferred: dialog clips only played from later
+markers (data/marker_audio_map_*.json) and standalone backgrounds the score
+never shows (data/background_score_map.json). Atlas pages and all other
+sounds stay critical, scenes use them as soon as they are created.
+"""
+import glob
+import json
+import os
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data')
+
+
+def load_marker_audio(paths=None):
+    """(dirFile, dirName) of every sound a marker audio map assigns to a marker."""
+    sounds = set()
+    for path in paths or sorted(glob.glob(os.path.join(DATA_DIR, 'marker_audio_map_*.json'))):
+        with open(path) as fp:
+            data = json.load(fp)
+        for name in data.get('markers', {}).values():
+            if name:
+                sounds.add((data['dirFile'], name.strip()))
+    return sounds
+
+
+def load_score_backgrounds(path=None):
+    """dirFile -> cast numbers the score uses as backgrounds."""
+    with open(path or os.path.join(DATA_DIR, 'background_score_map.json')) as fp:
+        data = json.load(fp)
+    backgrounds = {}
+    for movie in data.values():
+        backgrounds.setdefault(movie['dirFile'], set()).update(b['castId'] for b in movie['backgrounds'])
+    return backgrounds
+
+
+def is_deferred_sound(sound, marker_audio):
+    return (sound['data']['dirFile'], sound['data']['dirName']) in marker_audio
+
+
+def is_deferred_background(image, score_backgrounds):
+    """Backgrounds of movies without score data are kept critical."""
+    movie = score_backgrounds.get(image['dirFile'])
+    return movie is not None and image['dirNum'] not in movie
@@ -0,0 +1,122 @@
+import hashlib
+from collections import OrderedDict
+
+
+def file_hash(path):
+    """SHA-1 of a file's bytes, used as a content hash for cast member sources."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as fp:
+        for chunk in iter(lambda: fp.read(65536), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def image_content_key(image):
+    """
+    Key identifying the converted output of a bitmap member.
+
+    The metadata imageHash comes from Python's randomized str hash and is only
+    stable within one extraction run, so the source bitmap bytes are hashed
+    instead. The conversion flags are part of the key because the same bitmap
+    converted as opaque or with index 0 transparency gives a different PNG.
+    """
+    return '%s-%d%d' % (image['contentHash'], int(image['opaque']), int(image['transparent_index_0']))
+
+
+def resource_game(resource):
+    """Boat and car resources are never loaded together, so they get separate shared packs."""
+    for image in resource['images']:
+        if image['dirFile'].startswith('boten_'):
+            return 'boats'
+    return 'cars'
+
+
+def find_shared_images(resources, min_users=2):
+    """
+    Find bitmaps that are used by at least min_users resources.
+
+    Opaque resources are left out since their atlases use a different background.
+
+    Returns:
+        OrderedDict of content key -> list of resource names using it
+    """
+    users = OrderedDict()
+    for resource in resources:
+        if resource['opaque']:
+            continue
+        for image in resource['images']:
+            key = image_content_key(image)
+            if key not in users:
+                users[key] = []
+            if resource['name'] not in users[key]:
+                users[key].append(resource['name'])
+    return OrderedDict((key, names) for key, names in users.items() if len(names) >= min_users)
+
+
+def shared_savings(resources, shared):
+    """Uncompressed RGBA bytes no longer duplicated across atlases when shared images are moved."""
+    sizes = {}
+    for resource in resources:
+        for image in resource['images']:
+            key = image_content_key(image)
+            if key in shared:
+                sizes[key] = image['width'] * image['height'] * 4
+    return sum(sizes[key] * (len(names) - 1) for key, names in shared.items() if key in sizes)
+
+
+def split_shared_images(resources, shared, name):
+    """
+    Move shared images out of their resources into a new resource entry.
+
+    Every (dirFile, dirNum) alias is kept once in the shared resource so
+    director member lookups keep working, while the build dedupe collapses
+    equal content keys into a single atlas frame. Each moved image remembers
+    which resources use it so their packs can reference the right pages.
+    Opaque resources keep their images, as in find_shared_images().
+    """
+    common = {
+        'name': name,
+        'shared': True,
+        'opaque': False,
+        'images': [],
+        'sounds': [],
+        'strings': {},
+        'animations': {},
+        'files': [],
+    }
+    seen = set()
+    for resource in resources:
+        if resource['opaque']:
+            continue
+        kept = []
+        for image in resource['images']:
+            key = image_content_key(image)
+            if key not in shared:
+                kept.append(image)
+                continue
+            if (image['dirFile'], image['dirNum']) in seen:
+                continue
+            seen.add((image['dirFile'], image['dirNum']))
+            moved = dict(image)
+            moved['hash'] = key
+            moved['intName'] = str(len(common['images']) + 1)
+            moved['users'] = shared[key]
+            common['images'].append(moved)
+        resource['images'] = kept
+    return common
+
+
+def pages_by_user(image_pages):
+    """
+    Map resource names to the shared atlas pages they need.
+
+    Args:
+        image_pages: list of (image entry, atlas key) for the packed shared resource
+    """
+    pages = {}
+    for image, atlas_key in image_pages:
+        for user in image['users']:
+            pages.setdefault(user, [])
+            if atlas_key not in pages[user]:
+                pages[user].append(atlas_key)
+    return pages
@@ -0,0 +1,75 @@
+"""
+Move clips used by several resources into one shared audio sprite per game.
+
+UI sounds from 00.CXT, the boten_00.CXT ambience and members repeated per
+language end up in many resources and were encoded into each of their
+sprites. Clips are matched by a hash of the decoded PCM, so copies stored
+as different files or members still match. Every alias (dirFile, dirName)
+of a shared clip stays playable, the sprite JSON lists it as a clip on the
+same region.
+"""
+import hashlib
+from collections import OrderedDict
+
+from pydub import AudioSegment
+
+
+def pcm_hash(path):
+    seg = AudioSegment.from_file(path, 'wav')
+    digest = hashlib.sha1(('%d-%d-%d' % (seg.frame_rate, seg.channels, seg.sample_width)).encode('ascii'))
+    digest.update(seg.raw_data)
+    return digest.hexdigest(), seg.duration_seconds
+
+
+def find_shared_sounds(resources, min_users=2):
+    """
+    Returns:
+        OrderedDict of PCM hash -> {'users': resource names, 'seconds': clip length}
+        for clips used by at least min_users resources
+    """
+    by_file = {}
+    sounds = OrderedDict()
+    for resource in resources:
+        for sound in resource['sounds']:
+            # Equal files decode to equal PCM, only decode each file once
+            if sound['contentHash'] not in by_file:
+                by_file[sound['contentHash']] = pcm_hash(sound['path'])
+            key, seconds = by_file[sound['contentHash']]
+            sound['pcmHash'] = key
+            clip = sounds.setdefault(key, {'users': [], 'seconds': seconds})
+            if resource['name'] not in clip['users']:
+                clip['users'].append(resource['name'])
+    return OrderedDict((key, clip) for key, clip in sounds.items() if len(clip['users']) >= min_users)
+
+
+def duplicate_seconds(shared):
+    """Seconds of audio no longer encoded more than once."""
+    return sum(clip['seconds'] * (len(clip['users']) - 1) for clip in shared.values())
+
+
+def split_shared_sounds(resources, shared, common):
+    """
+    Move shared clips out of their resources into the shared resource entry
+    common (see shared_atlas.split_shared_images()), one clip per PCM hash
+    with the other members as aliases.
+    """
+    clips = {}
+    for resource in resources:
+        kept = []
+        for sound in resource['sounds']:
+            if sound['pcmHash'] not in shared:
+                kept.append(sound)
+                continue
+            resource['sharedAudio'] = common['name']
+            clip = clips.get(sound['pcmHash'])
+            if clip is None:
+                clip = dict(sound)
+                clip['aliases'] = []
+                clips[sound['pcmHash']] = clip
+                common['sounds'].append(clip)
+            elif sound['data']['dirName'] != clip['data']['dirName'] and \
+                    sound['data']['dirName'] not in [alias['data']['dirName'] for alias in clip['aliases']]:
+                clip['aliases'].append({'data': sound['data'], 'loop': sound['loop']})
+        resource['sounds'] = kept
+    common['soundUsers'] = sorted(set(user for clip in shared.values() for user in clip['users']))
+    return common
@@ -0,0 +1,50 @@
+"""
+Estimate what storing frames as deduplicated tiles would save.
+
+Animation sets redraw the same large regions in many frames (boat hulls,
+character bodies). Whole-frame hashing only catches exact copies, so every
+frame is cut into fixed tiles here and the unique, non-empty tiles are
+counted against the area the frames take in the atlas.
+"""
+import hashlib
+
+import numpy as np
+from PIL import Image
+
+
+def frame_tiles(path, tile):
+    """Hashes of the non-empty tiles of an image, its tile count and its pixel area."""
+    with Image.open(path) as image:
+        pixels = np.asarray(image.convert('RGBA'))
+    height, width = pixels.shape[:2]
+    rows = -(-height // tile)
+    cols = -(-width // tile)
+    padded = np.zeros((rows * tile, cols * tile, 4), dtype=np.uint8)
+    padded[:height, :width] = pixels
+    tiles = padded.reshape(rows, tile, cols, tile, 4).swapaxes(1, 2).reshape(rows * cols, -1)
+    # Fully transparent tiles would not be stored at all
+    visible = tiles.reshape(rows * cols, tile * tile, 4)[:, :, 3].any(axis=1)
+    return [hashlib.sha1(t.tobytes()).digest() for t in tiles[visible]], rows * cols, width * height
+
+
+def resource_tiles(paths, tile=32):
+    """
+    Returns:
+        {'frames', 'area': frame pixels, 'tiles': tiles of all frames,
+         'emptyTiles', 'uniqueTiles', 'tileArea': pixels of the unique tiles,
+         'saved': area - tileArea, 0 when padding frames to whole tiles costs
+         more than repeated tiles save}
+    """
+    unique = set()
+    area = 0
+    total = 0
+    empty = 0
+    for path in paths:
+        hashes, count, pixels = frame_tiles(path, tile)
+        area += pixels
+        total += count
+        empty += count - len(hashes)
+        unique.update(hashes)
+    tile_area = len(unique) * tile * tile
+    return {'frames': len(paths), 'area': area, 'tiles': total, 'emptyTiles': empty, 'uniqueTiles': len(unique),
+            'tileArea': tile_area, 'saved': max(0, area - tile_area)}
@@ -748,6 +748,7 @@ function createMockGame () {
       user: createMockUser(),
       UsersDB: { TestUser: null },  // filled below
       addAudio: noop,
+      loadDeferredPacks: noop,
       playAudio: () => ({ stop: noop, onStop: new MockSignal(), onComplete: new MockSignal(), isPlaying: false }),
       stopAudio: noop,
       getDirectorImage: () => ({
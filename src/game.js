@@ -9,7 +9,11 @@ import LoadState from 'load'
 
 import MulleNet from 'util/network'
 import MulleCursor from 'util/cursor'
-import { resolveDirectorImageCandidate } from 'util/directorImageResolver'
+import {
+  getIndexedDirectorFrames,
+  pickBestDirectorCandidate,
+  resolveDirectorImageCandidate
+} from 'util/directorImageResolver'
 
 import MenuState from 'scenes/menu'
 import FileBrowserState from 'scenes/filebrowser'
@@ -102,6 +106,21 @@ import GameObserver from 'objects/GameObserver'
 
 var memberLookup = {}
 var directorImageLookup = {}
+var memberIndex = {}
+var memberIndexKeys = {}
+
+// Merge the member indexes (<pack>-members.json) loaded since the last call
+function mergeMemberIndexes (cache) {
+  for (const key of cache.getKeys(Phaser.Cache.JSON)) {
+    if (memberIndexKeys[key] || !key.endsWith('-members')) continue
+    memberIndexKeys[key] = true
+
+    const images = (cache.getJSON(key) || {}).images || {}
+    for (const ref in images) {
+      memberIndex[ref] = (memberIndex[ref] || []).concat(images[ref])
+    }
+  }
+}
 
 /**
  * Main game object
@@ -448,14 +467,58 @@ class MulleGame extends Phaser.Game {
         }
       }
 
+      // Long clips are not in a sprite, they are decoded on first play
+      const streamKey = this.game.mulle.streams[searchNorm] || this.game.mulle.streams[searchNorm00]
+      if (streamKey && this.game.cache.checkSoundKey(streamKey)) {
+        if (!this.game.mulle.streamSounds[streamKey]) {
+          this.game.mulle.streamSounds[streamKey] = this.game.add.audio(streamKey)
+        }
+        var stream = this.game.mulle.streamSounds[streamKey]
+        // Clip data of the played member, aliases of a shared clip have their own cue points
+        const streamData = this.game.cache.checkJSONKey(streamKey) && this.game.cache.getJSON(streamKey)
+        if (streamData && streamData.spritemap) {
+          const clip = findKeyInsensitive(streamData.spritemap, searchNorm) ||
+            findKeyInsensitive(streamData.spritemap, searchNorm00) || Object.keys(streamData.spritemap)[0]
+          stream.extraData = clip && streamData.spritemap[clip].data
+        }
+        stream.play()
+
+        if (typeof loopFlag === 'boolean') {
+          stream.loop = loopFlag
+        }
+
+        if (onStopFn) { stream.onStop.addOnce(onStopFn) }
+
+        return stream
+      }
+
       console.debug('sound not found', id)
 
       return false
     }
 
+    // Streamed clips by lower case dirName -> sound key, filled by the
+    // processPack override in index.js, and their sound objects by key
+    this.mulle.streams = {}
+    this.mulle.streamSounds = {}
+
+    // Shared audio sprites by resource name, filled by the processPack override in index.js
+    this.mulle.sharedAudio = {}
+
     this.mulle.addAudio = function (key) {
+      if (!this.game.mulle.sharedAudio[key]) {
+        for (const shared in this.game.mulle.sharedAudio) {
+          if (this.game.cache.checkSoundKey(shared + '-audio')) {
+            this.game.mulle.addAudio(shared)
+          }
+        }
+      }
+
       if (this.game.mulle.audio[key]) return
 
+      // All clips of a resource can be in the shared sprite
+      if (Object.keys(this.game.mulle.sharedAudio).length > 0 && !this.game.cache.checkSoundKey(key + '-audio')) return
+
       this.game.mulle.audio[key] = new MulleAudio(this.game, key + '-audio')
 
       for (var id in this.game.mulle.audio[key].config.spritemap) {
@@ -485,6 +548,29 @@ class MulleGame extends Phaser.Game {
       console.debug('[audio]', 'add', this.game.mulle.audio[key])
     }
 
+    // Deferred pack entries (assets.py --progressive) of the packs loaded so
+    // far, by pack key. Filled by the processPack override in index.js.
+    this.mulle.deferredPacks = {}
+
+    this.mulle.loadDeferredPacks = function () {
+      const keys = Object.keys(this.deferredPacks)
+      if (keys.length === 0) return
+
+      for (const key of keys) {
+        this.game.load.pack(key + '-deferred', null, { [key + '-deferred']: this.deferredPacks[key] }, this)
+      }
+      this.deferredPacks = {}
+
+      this.game.load.onLoadComplete.addOnce(() => {
+        for (const key of keys) {
+          if (this.game.cache.checkSoundKey(key + '-deferred-audio')) {
+            this.addAudio(key + '-deferred')
+          }
+        }
+      })
+      this.game.load.start()
+    }
+
     this.mulle.stopAudio = function (id) {
       const normalize = (val) => String(val || '').trim().toLowerCase()
       const searchId = normalize(id)
@@ -498,6 +584,11 @@ class MulleGame extends Phaser.Game {
         }
       }
 
+      const streamKey = this.game.mulle.streams[searchId]
+      if (streamKey && this.game.mulle.streamSounds[streamKey]) {
+        return this.game.mulle.streamSounds[streamKey].stop()
+      }
+
       console.debug('sound not found', id)
 
       return false
@@ -760,6 +851,21 @@ class MulleGame extends Phaser.Game {
       var lAlt = dir.startsWith('boten_') ? dir.substring(6) + '_' + num : 'boten_' + dir + '_' + num
       if (directorImageLookup[lAlt]) return directorImageLookup[lAlt]
 
+      // Loaded packs list their members, no need to scan every atlas
+      mergeMemberIndexes(this.game.cache)
+      const indexed = []
+      for (const [key, name] of getIndexedDirectorFrames(dir, num, memberIndex)) {
+        const img = this.game.cache.checkImageKey(key) ? this.game.cache.getImage(key, true) : null
+        const frame = img && img.frameData ? img.frameData.getFrameByName(name) : null
+        if (frame) indexed.push({ frame: frame, key: key, name: name })
+      }
+      if (indexed.length > 0) {
+        const resolved = pickBestDirectorCandidate(indexed)
+        directorImageLookup[l] = resolved
+        directorImageLookup[lAlt] = resolved
+        return resolved
+      }
+
       var keys = this.game.cache.getKeys(Phaser.Cache.IMAGE)
       var searchedKeys = []
       var foundDirFiles = []
@@ -8,6 +8,7 @@ import Phaser from 'expose-loader?Phaser!phaser-ce/build/custom/phaser-split.js'
 // import Phaser from 'phaser-ce';
 
 import MulleGame from 'game'
+import { decodeCompact } from 'util/compactMeta'
 console.debug('Import Game')
 
 console.debug('Create game')
@@ -76,6 +77,88 @@ Phaser.AnimationParser.JSONDataHash = function (game, json) {
   return data
 }
 
+console.debug('Override cache for compact metadata')
+// Packs point atlas and audio sprite JSON at their .compact.json form
+// (compactURL), it is decoded back to the regular layout as it is cached
+const addTextureAtlas = Phaser.Cache.prototype.addTextureAtlas
+Phaser.Cache.prototype.addTextureAtlas = function (key, url, data, atlasData, format) {
+  return addTextureAtlas.call(this, key, url, data, decodeCompact(atlasData), format)
+}
+const addJSON = Phaser.Cache.prototype.addJSON
+Phaser.Cache.prototype.addJSON = function (key, url, data) {
+  return addJSON.call(this, key, url, decodeCompact(data))
+}
+
+console.debug('Override shared atlas loading')
+const loadAtlasJSONHash = Phaser.Loader.prototype.atlasJSONHash
+Phaser.Loader.prototype.atlasJSONHash = function (key, textureURL, atlasURL, atlasData) {
+  // Shared atlas pages (common-sprites-N, boten_common-sprites-N) are listed in
+  // every pack that uses them, only fetch them the first time
+  if (key.indexOf('common-sprites-') !== -1 && this.game.cache.checkImageKey(key)) {
+    return this
+  }
+  return loadAtlasJSONHash.call(this, key, textureURL, atlasURL, atlasData)
+}
+
+console.debug('Override pack texture format')
+// Atlas pack entries list their page as PNG (JPEG for standalone backgrounds)
+// plus smaller WebP/AVIF encodings in 'textures', smallest first. Decoding support is probed once at startup,
+// until a probe finishes that format is treated as unsupported.
+const textureSupport = { png: true, jpg: true, webp: false, avif: false }
+const textureProbes = {
+  webp: 'data:image/webp;base64,UklGRhwAAABXRUJQVlA4TA8AAAAvAAAAEAcQ/Y8CBiKi/wEA',
+  avif: 'data:image/avif;base64,AAAAIGZ0eXBhdmlmAAAAAGF2aWZtaWYxbWlhZk1BMUIAAADrbWV0YQAAAAAAAAAhaGRscgAAAAAAAAAAcGljdAAAAAAAAAAAAAAAAAAAAAAOcGl0bQAAAAAAAQAAAB5pbG9jAAAAAEQAAAEAAQAAAAEAAAETAAAAKAAAAChpaW5mAAAAAAABAAAAGmluZmUCAAAAAAEAAGF2MDFDb2xvcgAAAABqaXBycAAAAEtpcGNvAAAAFGlzcGUAAAAAAAAAAQAAAAEAAAAQcGl4aQAAAAADCAgIAAAADGF2MUOBAAwAAAAAE2NvbHJuY2x4AAEADQAGgAAAABdpcG1hAAAAAAAAAAEAAQQBAoMEAAAAMG1kYXQSAAoIGAAGiAhoNCAyGhlHh4Yhh5555oAAAJBAyRxhSytNj1FFTqSg'
+}
+for (const format in textureProbes) {
+  const probe = new Image()
+  probe.onload = function () {
+    textureSupport[format] = probe.width > 0
+  }
+  probe.src = textureProbes[format]
+}
+
+const processPack = Phaser.Loader.prototype.processPack
+Phaser.Loader.prototype.processPack = function (pack) {
+  // Loaded by MulleState.create() once the scene runs
+  const deferred = pack.data && pack.data[pack.key + '-deferred']
+  if (deferred) {
+    this.game.mulle.deferredPacks[pack.key] = deferred
+  }
+
+  const files = pack.data && pack.data[pack.key]
+  if (files) {
+    for (const file of files) {
+      // Decoded by the cache override above
+      if (file.compactURL) {
+        if (file.type === 'atlasJSONHash') {
+          file.atlasURL = file.compactURL
+        } else {
+          file.jsonURL = file.compactURL
+        }
+      }
+      // Long clips written as files of their own (assets.py --stream-audio)
+      // Their JSON holds the clip data (cue points) like a sprite's spritemap
+      if (file.mode === 'stream') {
+        for (const dirName of [file.dirName].concat(file.aliases || [])) {
+          this.game.mulle.streams[String(dirName).trim().toLowerCase()] = file.key
+        }
+        this.json(file.key, file.jsonURL)
+      }
+      // Clips several resources use (MULLE_ASSETS_SHARED_AUDIO=1), added with the scene's own sprite
+      if (file.shared && file.type === 'audiosprite') {
+        this.game.mulle.sharedAudio[file.key.replace(/-audio$/, '')] = true
+      }
+      if (file.textures) {
+        const texture = file.textures.find(t => textureSupport[t.format])
+        if (texture) {
+          file.textureURL = texture.url
+        }
+      }
+    }
+  }
+  return processPack.call(this, pack)
+}
+
 window.addEventListener('beforeunload', function (e) {
   console.debug('Unload shutdown')
   game.state.states[game.state.current].shutdown()
@@ -102,6 +102,8 @@ class MulleState extends Phaser.State {
       this.startMovie()
     }
 
+    this.game.mulle.loadDeferredPacks()
+
     // console.log('prelaunch', this.key);
   }
 
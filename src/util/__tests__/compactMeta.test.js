@@ -0,0 +1,32 @@
+/**
+ * Decoding of the compact metadata written by build_scripts/compact_meta.py.
+ * The fixtures are its output, tests/test_compact_meta.py keeps them in sync.
+ */
+'use strict'
+
+import { decodeAtlas, decodeAudio, decodeCompact } from '../compactMeta'
+
+const atlas = require('./fixtures/atlas.json')
+const compactAtlas = require('./fixtures/atlas.compact.json')
+const audio = require('./fixtures/audio.json')
+const compactAudio = require('./fixtures/audio.compact.json')
+
+describe('compactMeta', () => {
+  test('decodes atlas frames', () => {
+    expect(decodeAtlas(compactAtlas)).toEqual(atlas)
+  })
+
+  test('decodes audio clips with and without cue points', () => {
+    const decoded = decodeAudio(compactAudio)
+    expect(decoded).toEqual(audio)
+    expect(decoded.spritemap['10e001v0'].data.cue).toBeUndefined()
+  })
+
+  test('decodeCompact passes regular JSON through', () => {
+    expect(decodeCompact(compactAtlas)).toEqual(atlas)
+    expect(decodeCompact(compactAudio)).toEqual(audio)
+    expect(decodeCompact(atlas)).toBe(atlas)
+    expect(decodeCompact(audio)).toBe(audio)
+    expect(decodeCompact(null)).toBe(null)
+  })
+})
@@ -0,0 +1,58 @@
+/**
+ * Decoders for the columnar <name>.compact.json files assets.py writes next
+ * to atlas and audio sprite JSON (build_scripts/compact_meta.py). Both return
+ * the regular JSON layout, ready for atlasJSONHash / audiosprite data.
+ * Packs load the compact files, index.js decodes them as they are cached.
+ */
+'use strict'
+
+export function decodeAtlas (data) {
+  const strings = data.strings
+  const c = data.frames
+  const frames = {}
+
+  for (let i = 0; i < c.key.length; i++) {
+    frames[c.key[i]] = {
+      frame: { x: c.x[i], y: c.y[i], w: c.w[i], h: c.h[i] },
+      regpoint: { x: c.rx[i], y: c.ry[i] },
+      dirFile: strings[c.file[i]],
+      dirName: strings[c.name[i]],
+      dirNum: c.num[i]
+    }
+  }
+
+  return { frames: frames, meta: data.meta }
+}
+
+/**
+ * Regular JSON of compact atlas or audio data, other data is returned as it is
+ */
+export function decodeCompact (data) {
+  if (!data || !data.strings) {
+    return data
+  }
+  if (data.frames && Array.isArray(data.frames.key)) {
+    return decodeAtlas(data)
+  }
+  if (data.clips) {
+    return decodeAudio(data)
+  }
+  return data
+}
+
+export function decodeAudio (data) {
+  const strings = data.strings
+  const c = data.clips
+  const spritemap = {}
+
+  for (let i = 0; i < c.id.length; i++) {
+    const extra = { dirName: strings[c.name[i]], dirFile: strings[c.file[i]], dirNum: c.num[i] }
+    if (c.cue && c.cue[i] !== null) {
+      extra.cue = c.cue[i]
+    }
+
+    spritemap[strings[c.id[i]]] = { start: c.start[i], end: c.end[i], loop: c.loop[i] === 1, data: extra }
+  }
+
+  return { resources: data.resources, spritemap: spritemap }
+}
@@ -47,6 +47,19 @@ export function getDirectorResolvedName (dir, member, directorMemberMap = {}) {
   return memberMap[memberKey] || null
 }
 
+// memberIndex maps 'dirFile/dirNum' to [atlas key, frame key, width, height]
+// lists, merged from the <pack>-members.json files assets.py writes.
+export function getIndexedDirectorFrames (dir, member, memberIndex = {}) {
+  if (!dir || !isNumericDirectorMember(member) || !isPlainObject(memberIndex)) return []
+
+  const frames = []
+  for (const alias of getDirectorDirAliases(dir)) {
+    const entries = memberIndex[`${alias}/${Number(member)}`]
+    if (Array.isArray(entries)) frames.push(...entries)
+  }
+  return frames
+}
+
 export function matchesDirectorDirFile (frame, dir) {
   if (!frame || !dir) return false
   return getDirectorDirAliases(dir).includes(frame.dirFile)
@@ -0,0 +1,62 @@
+"""
+Tests for asset_manifest.py - skipping resources whose inputs did not change.
+"""
+
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from build_scripts import asset_manifest
+from build_scripts.asset_manifest import build_manifest, save_manifest, is_up_to_date
+
+
+def make_entry():
+    return {'name': 'menu', 'opaque': False, 'files': [], 'strings': {}, 'animations': {}, 'sounds': [],
+            'images': [{'dirFile': '10.DXR', 'dirNum': 2, 'contentHash': 'abc'}]}
+
+
+class TestManifest:
+
+    def test_unchanged_inputs_reuse_result(self):
+        with tempfile.TemporaryDirectory() as out:
+            open(os.path.join(out, 'menu.json'), 'w').close()
+            manifest = build_manifest(make_entry(), {'optimizeImages': 0})
+            save_manifest(out, manifest, {'pages': [], 'outputs': ['menu.json'], 'userPages': {}})
+
+            again = build_manifest(make_entry(), {'optimizeImages': 0})
+            assert is_up_to_date(out, again) == {'pages': [], 'outputs': ['menu.json'], 'userPages': {}}
+
+    def test_changed_member_or_settings_rebuilds(self):
+        with tempfile.TemporaryDirectory() as out:
+            open(os.path.join(out, 'menu.json'), 'w').close()
+            save_manifest(out, build_manifest(make_entry(), {'optimizeImages': 0}),
+                          {'pages': [], 'outputs': ['menu.json'], 'userPages': {}})
+
+            entry = make_entry()
+            entry['images'][0]['contentHash'] = 'def'
+            assert is_up_to_date(out, build_manifest(entry, {'optimizeImages': 0})) is None
+            assert is_up_to_date(out, build_manifest(make_entry(), {'optimizeImages': 7})) is None
+
+    def test_missing_output_rebuilds(self):
+        with tempfile.TemporaryDirectory() as out:
+            manifest = build_manifest(make_entry(), {'optimizeImages': 0})
+            save_manifest(out, manifest, {'pages': [], 'outputs': ['menu.json'], 'userPages': {}})
+            assert is_up_to_date(out, manifest) is None
+
+    def test_changed_pipeline_module_rebuilds(self, monkeypatch):
+        assert any(path.endswith(os.sep + 'assets.py') for path in asset_manifest.PIPELINE_MODULES)
+        assert any(path.endswith('parse_animation_chart.py') for path in asset_manifest.PIPELINE_MODULES)
+        with tempfile.TemporaryDirectory() as out:
+            module = os.path.join(out, 'module.py')
+            with open(module, 'w') as fp:
+                fp.write('VERSION = 1\n')
+            monkeypatch.setattr(asset_manifest, 'PIPELINE_MODULES', [module])
+            open(os.path.join(out, 'menu.json'), 'w').close()
+            save_manifest(out, build_manifest(make_entry(), {'code': asset_manifest.code_hash()}),
+                          {'pages': [], 'outputs': ['menu.json'], 'userPages': {}})
+            assert is_up_to_date(out, build_manifest(make_entry(), {'code': asset_manifest.code_hash()}))
+
+            with open(module, 'w') as fp:
+                fp.write('VERSION = 2\n')
+            assert is_up_to_date(out, build_manifest(make_entry(), {'code': asset_manifest.code_hash()})) is None
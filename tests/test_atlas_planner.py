@@ -0,0 +1,57 @@
+"""
+Tests for atlas_planner.py - choosing atlas page sizes per resource.
+"""
+
+import os
+import sys
+import tempfile
+
+from PIL import Image
+from PyTexturePacker import ImageRect
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'build_scripts'))
+from atlas_planner import candidate_sizes, plan
+
+
+def make_rects(folder, sizes):
+    rects = []
+    for i, size in enumerate(sizes):
+        path = os.path.join(folder, '%d.png' % i)
+        Image.new('RGBA', size, (i * 10, 0, 0, 255)).save(path)
+        rects.append(ImageRect.ImageRect(path))
+    return rects
+
+
+class TestPlan:
+
+    def test_candidates_stay_within_cap(self):
+        sizes = candidate_sizes(1024)
+        assert sizes[0] == (1024, 1024)
+        assert all(w <= 1024 and h <= 1024 for w, h in sizes)
+
+    def test_pages_are_cropped_to_their_sprites(self):
+        with tempfile.TemporaryDirectory() as folder:
+            rects = make_rects(folder, [(300, 200), (100, 100)])
+            packer, atlas_list, result = plan(rects, 0x00ffffff, 2048)
+            stats = result['stats']
+            assert stats['texels'] < result['baseline']['texels']
+            assert stats['efficiency'] > result['baseline']['efficiency']
+            for atlas in atlas_list:
+                for rect in atlas.image_rect_list:
+                    assert rect.right <= atlas.size[0] and rect.bottom <= atlas.size[1]
+
+    def test_page_budget_is_respected(self):
+        with tempfile.TemporaryDirectory() as folder:
+            rects = make_rects(folder, [(600, 480)] * 2)
+            packer, atlas_list, result = plan(rects, 0x00ffffff, 2048, max_pages=1)
+            assert len(atlas_list) == 1
+            assert result['stats']['spriteArea'] == 2 * 600 * 480
+
+    def test_no_extra_pages_without_budget(self):
+        with tempfile.TemporaryDirectory() as folder:
+            # Two 1024 pages would need fewer texels than one cropped 2048 page
+            rects = make_rects(folder, [(1000, 1000), (1000, 1000), (900, 60)])
+            packer, atlas_list, result = plan(rects, 0x00ffffff, 2048)
+            assert len(result['baseline']['pages']) == 1
+            assert len(atlas_list) == 1
+            assert result['stats']['texels'] <= result['baseline']['texels']
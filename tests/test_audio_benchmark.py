@@ -0,0 +1,47 @@
+"""
+Tests for audio_benchmark.py - synthetic clip sets and per stage build stats.
+"""
+
+import os
+import sys
+import tempfile
+import wave
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from build_scripts.audio_benchmark import build, compare, generate, clip_summary
+
+
+class TestGenerate:
+
+    def test_same_seed_same_clips(self):
+        with tempfile.TemporaryDirectory() as a, tempfile.TemporaryDirectory() as b:
+            first = clip_summary(generate(a, 20, seed=3))
+            assert first == clip_summary(generate(b, 20, seed=3))
+            assert first['count'] == 20
+            assert set(first['formats']) <= {'11025/8', '22050/8', '22050/16'}
+
+    def test_wav_matches_clip(self):
+        with tempfile.TemporaryDirectory() as folder:
+            clip = generate(folder, 1, seed=1)[0]
+            with wave.open(clip['path'], 'rb') as w:
+                assert (w.getframerate(), w.getsampwidth()) == (clip['rate'], clip['width'])
+                assert w.getnframes() / float(w.getframerate()) == clip['seconds']
+
+
+class TestBuild:
+
+    def test_stages(self):
+        with tempfile.TemporaryDirectory() as folder:
+            clips = [clip for clip in generate(folder, 8, seed=2) if clip['seconds'] < 5][:3]
+            result = build(clips, folder, layout='tight')
+
+            assert list(result['stages']) == ['load', 'concatenate', 'encode', 'json']
+            encode = result['stages']['encode']
+            assert encode['bytesWritten'] == os.path.getsize(os.path.join(folder, 'bench-tight-audio.ogg'))
+            assert encode['peakRss'] > 0
+            assert encode['realtimeFactor'] > 0
+            assert result['spriteSeconds'] > sum(clip['seconds'] for clip in clips)
+
+            lines = compare({'clips': None, 'runs': [result]}, {'clips': None, 'runs': [result]})
+            assert len(lines) == 4
+            assert '(+0%)' in lines[0]
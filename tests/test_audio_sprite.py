@@ -0,0 +1,123 @@
+"""
+Tests for audiosprite/audio_sprite.py - joining clips into one sprite.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import wave
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from audiosprite import AudioSprite
+
+
+def make_wav(folder, name, frames, rate=22050, width=2, value=1):
+    path = os.path.join(folder, name + '.wav')
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(width)
+        w.setframerate(rate)
+        w.writeframes(bytes([value]) * frames * width)
+    return path
+
+
+class TestConcatenate:
+
+    def test_offsets_are_exact(self):
+        with tempfile.TemporaryDirectory() as folder:
+            sprite = AudioSprite('test')
+            sprite.addAudio(make_wav(folder, 'a', 8820))
+            sprite.addAudio(make_wav(folder, 'b', 11025, rate=11025, width=1, value=200))
+            out = sprite._concatenate()
+
+            assert out.frame_rate == 22050
+            assert out.sample_width == 2
+            a, silence, b = sprite._files
+            assert (a['start'], a['frames']) == (0, 8820)
+            assert (silence['start'], silence['frames']) == (8820, 22050)
+            assert b['start'] == 8820 + 22050
+            assert out.frame_count() == b['start'] + b['frames']
+            # silence stays zero
+            assert bytes(out.raw_data[8820 * 2:b['start'] * 2]) == bytes(22050 * 2)
+
+            spritemap = sprite._genSpriteData()['spritemap']
+            assert spritemap['b']['start'] == round(b['start'] / 22050.0, 6)
+
+
+class TestEncode:
+
+    def test_ogg_uses_opus_rate(self):
+        args = AudioSprite('test')._outputArgs('ogg', '32k', ['-ar', '22050', '-ac', '1'], None, '4')
+        assert args == ['-acodec', 'libopus', '-ar', '24000', '-b:a', '32k', '-ac', '1']
+
+    def test_other_formats_match_pydub_export(self):
+        args = AudioSprite('test')._outputArgs('mp3', '64k', ['-ar', '22050'], {'title': 'Mulle'}, '3')
+        assert args == ['-b:a', '64k', '-ar', '22050', '-metadata', 'title=Mulle', '-id3v2_version', '3',
+                        '-f', 'mp3']
+
+
+class TestCache:
+
+    def test_second_save_comes_from_cache(self):
+        with tempfile.TemporaryDirectory() as folder:
+            cache = os.path.join(folder, 'cache')
+            paths = [make_wav(folder, 'a', 2205), make_wav(folder, 'b', 4410, value=3)]
+            saved = []
+            for out in ['first', 'second']:
+                sprite = AudioSprite('test')
+                for path in paths:
+                    sprite.addAudio(path)
+                sprite.save(os.path.join(folder, out), 'test-audio', formats=['ogg'], bitrate='32k', cache_dir=cache)
+                saved.append(sprite)
+            assert not saved[0].cached
+            assert saved[1].cached
+            assert saved[1].duration() == saved[0].duration()
+            with open(os.path.join(folder, 'second', 'test-audio.json')) as fp:
+                assert 'b' in fp.read()
+
+    def test_resources_name_the_written_file(self):
+        with tempfile.TemporaryDirectory() as folder:
+            sprite = AudioSprite('test-stream-a')
+            sprite.addAudio(make_wav(folder, 'a', 2205), extraData={'dirName': 'a', 'cue': [[10, 'talk']]})
+            sprite.save(folder, 'test-stream-a', formats=['ogg'], bitrate='32k')
+            with open(os.path.join(folder, 'test-stream-a.json')) as fp:
+                data = json.load(fp)
+            assert data['resources'] == ['assets/test-stream-a.ogg']
+            assert data['spritemap']['a']['data']['cue'] == [[10, 'talk']]
+
+    def test_key_covers_pcm_and_settings(self):
+        with tempfile.TemporaryDirectory() as folder:
+            keys = set()
+            for i, (value, bitrate) in enumerate([(1, '32k'), (2, '32k'), (1, '64k')]):
+                os.makedirs(os.path.join(folder, str(i)))
+                sprite = AudioSprite('test')
+                sprite.addAudio(make_wav(os.path.join(folder, str(i)), 'a', 2205, value=value))
+                keys.add(sprite.cacheKey(['ogg'], bitrate, None, None, '4'))
+            assert len(keys) == 3
+
+
+class TestLayout:
+
+    def test_tight_layout_gaps(self):
+        with tempfile.TemporaryDirectory() as folder:
+            sprite = AudioSprite('test')
+            sprite.setGuardGap(AudioSprite.guardGap(['ogg']))
+            sprite.addAudio(make_wav(folder, 'a', 2205))
+            sprite.addAudio(make_wav(folder, 'b', 2205))
+            sprite.addAudio(make_wav(folder, 'loop', 2205), isLooped=True)
+            sprite.addAudio(make_wav(folder, 'c', 2205), gap=500)
+            sprite._concatenate()
+
+            gaps = [f['frames'] for f in sprite._files if f['id'] == 'SILENCE']
+            assert gaps == [round(22050 * AudioSprite.GUARD_GAPS['ogg'] / 1000.0),
+                            round(22050 * AudioSprite.LOOP_GAP / 1000.0), 22050 // 2]
+            assert sprite.duration() < 4 * 0.1 + 3 * 1.0
+
+    def test_fixed_layout_by_default(self):
+        with tempfile.TemporaryDirectory() as folder:
+            sprite = AudioSprite('test')
+            sprite.addAudio(make_wav(folder, 'a', 2205))
+            sprite.addAudio(make_wav(folder, 'b', 2205), gap=10)
+            sprite._concatenate()
+            assert sprite._files[1]['frames'] == 22050
@@ -0,0 +1,44 @@
+"""
+Tests for audio_streams.py - writing long clips as files of their own.
+"""
+
+import os
+import sys
+import tempfile
+import wave
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'build_scripts'))
+from audio_streams import decoded_bytes, split_streams, sprite_seconds, stream_name
+
+
+def make_sound(folder, name, seconds, rate=22050):
+    path = os.path.join(folder, name + '.wav')
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(bytes(int(rate * seconds) * 2))
+    return {'path': path, 'loop': False, 'data': {'dirFile': 'boten_12.DXR', 'dirName': name, 'dirNum': 1}}
+
+
+class TestSplitStreams:
+
+    def test_long_clips_are_streamed(self):
+        with tempfile.TemporaryDirectory() as folder:
+            click = make_sound(folder, 'click', 0.2)
+            narration = make_sound(folder, 'intro', 30, rate=11025)
+            sprite, streams = split_streams([click, narration], 20)
+            assert sprite == [click]
+            assert streams == [narration]
+            assert sprite_seconds([click, narration]) == 31.2
+            assert decoded_bytes(sprite_seconds(sprite)) < decoded_bytes(31.2)
+
+    def test_sprite_keeps_a_clip(self):
+        with tempfile.TemporaryDirectory() as folder:
+            sounds = [make_sound(folder, 'a', 3), make_sound(folder, 'b', 4)]
+            assert split_streams(sounds, 1) == (sounds, [])
+            assert split_streams(sounds, 0) == (sounds, [])
+
+    def test_stream_name(self):
+        sound = {'data': {'dirName': '12d036 v0'}}
+        assert stream_name('zee_intro', sound) == 'zee_intro-stream-12d036_v0'
@@ -0,0 +1,50 @@
+"""
+Tests for audio_trim.py - level stats and silence trimming of clips.
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'build_scripts'))
+from audio_trim import analyse, shift_clip_cues, shift_cues
+
+
+class TestAnalyse:
+
+    def test_dc_padding_is_trimmed(self):
+        rate = 22050
+        samples = np.full(rate * 2, 300, dtype=np.int16)
+        t = np.arange(rate) / float(rate)
+        samples[rate // 2:rate // 2 + rate] += (np.sin(2 * np.pi * 300 * t) * 12000).astype(np.int16)
+        stats = analyse(samples.tobytes(), 2, 1, rate)
+        assert stats['frames'] == rate * 2
+        first, end = stats['trim']
+        assert rate // 2 - rate * 5 // 1000 <= first <= rate // 2
+        assert rate // 2 + rate <= end <= rate // 2 + rate + rate * 20 // 1000
+        assert stats['dc'] == round(300 / 32768.0, 5)
+        assert -9 < stats['peak'] < -8
+
+    def test_silent_and_stereo_clips(self):
+        silent = analyse(bytes(400), 2, 2, 11025)
+        assert silent['trim'] == [0, 100]
+        assert silent['peak'] is None
+
+        stereo = np.zeros((1000, 2), dtype=np.int16)
+        stereo[500, 1] = 10000
+        assert analyse(stereo.tobytes(), 2, 2, 1000)['trim'] == [495, 521]
+
+    def test_shift_cues(self):
+        assert shift_cues([[600, 'talk'], [100, 'start'], [1900, 'end']], 495, 1000) == \
+            [[105, 'talk'], [0, 'start'], [1000, 'end']]
+        assert shift_cues([100, 1500], 50, 1200) == [50, 1200]
+
+    def test_aliases_are_shifted_with_the_clip(self):
+        clip = {'data': {'dirName': '00d110v0', 'cue': [[600, 'talk']]},
+                'aliases': [{'data': {'dirName': '00d416v0', 'cue': [[795, 'talk']]}, 'loop': False},
+                            {'data': {'dirName': '00d417v0'}, 'loop': True}]}
+        shift_clip_cues(clip, 495, 1000)
+        assert clip['data']['cue'] == [[105, 'talk']]
+        assert clip['aliases'][0]['data']['cue'] == [[300, 'talk']]
+        assert 'cue' not in clip['aliases'][1]['data']
@@ -0,0 +1,44 @@
+"""
+Tests for compact_meta.py - columnar atlas and audio sprite metadata.
+"""
+
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'build_scripts'))
+from compact_meta import decode_atlas, decode_audio, encode_atlas, encode_audio
+
+# Decoded by src/util/__tests__/compactMeta.test.js
+FIXTURES = os.path.join(os.path.dirname(__file__), '..', 'src', 'util', '__tests__', 'fixtures')
+
+
+def frame(x, num, name):
+    return {'frame': {'x': x, 'y': 2, 'w': 60, 'h': 40}, 'regpoint': {'x': 30, 'y': 20},
+            'dirFile': '10.DXR', 'dirName': name, 'dirNum': num}
+
+
+class TestCompactMeta:
+
+    def test_atlas_roundtrip(self):
+        atlas = {'frames': {'1': frame(2, 115, 'door'), '2': frame(64, 116, '10.DXR_116')},
+                 'meta': {'size': {'w': 128, 'h': 64}, 'image': 'assets/menu-sprites-0.png', 'scale': '1'}}
+        compact = encode_atlas(atlas)
+        assert compact['strings'] == ['10.DXR', 'door', '10.DXR_116']
+        assert decode_atlas(compact) == atlas
+
+    def test_audio_roundtrip(self):
+        sprite = {'resources': ['assets/menu-audio.ogg'], 'spritemap': {
+            '10e001v0': {'start': 0.0, 'end': 0.4, 'loop': False,
+                         'data': {'dirName': '10e001v0', 'dirFile': '10.DXR', 'dirNum': 287}},
+            '10e002v0': {'start': 1.4, 'end': 4.4, 'loop': True,
+                         'data': {'dirName': '10e002v0', 'dirFile': '10.DXR', 'dirNum': 288, 'cue': [100, 1500]}},
+        }}
+        assert decode_audio(encode_audio(sprite)) == sprite
+
+    def test_js_fixtures_match_encoder(self):
+        for name, encode in [('atlas', encode_atlas), ('audio', encode_audio)]:
+            with open(os.path.join(FIXTURES, name + '.json')) as fp:
+                regular = json.load(fp)
+            with open(os.path.join(FIXTURES, name + '.compact.json')) as fp:
+                assert json.load(fp) == encode(regular)
@@ -0,0 +1,49 @@
+"""
+Tests for hashed_names.py - content-hashed asset file names and manifest.json.
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'build_scripts'))
+from hashed_names import publish
+
+
+def write(folder, name, data):
+    with open(os.path.join(folder, name), 'w') as fp:
+        fp.write(data if isinstance(data, str) else json.dumps(data))
+
+
+def make_dist(folder, page='png-data'):
+    write(folder, 'a-sprites-0.png', page)
+    write(folder, 'a-sprites-0.json', {'frames': {}, 'meta': {'image': 'assets/a-sprites-0.png'}})
+    write(folder, 'a.json', {'a': [{'type': 'atlasJSONHash', 'key': 'a-sprites-0',
+                                    'textureURL': 'assets/a-sprites-0.png', 'atlasURL': 'assets/a-sprites-0.json'}]})
+
+
+class TestPublish:
+
+    def test_pack_points_at_hashed_copies(self):
+        with tempfile.TemporaryDirectory() as folder:
+            make_dist(folder)
+            manifest = publish(folder, 'assets', ['a'])
+            with open(os.path.join(folder, 'a.json')) as fp:
+                entry = json.load(fp)['a'][0]
+            page = manifest['a-sprites-0.png']['file']
+            assert entry['textureURL'] == 'assets/' + page
+            assert page != 'a-sprites-0.png'
+            with open(os.path.join(folder, entry['atlasURL'][len('assets/'):])) as fp:
+                assert json.load(fp)['meta']['image'] == 'assets/' + page
+            assert manifest['a.json']['integrity'].startswith('sha384-')
+
+    def test_changed_file_gets_new_name_and_old_copy_is_removed(self):
+        with tempfile.TemporaryDirectory() as folder:
+            make_dist(folder)
+            first = publish(folder, 'assets', ['a'])['a-sprites-0.png']['file']
+            make_dist(folder, page='other-data')
+            second = publish(folder, 'assets', ['a'])['a-sprites-0.png']['file']
+            assert first != second
+            assert not os.path.exists(os.path.join(folder, first))
+            assert os.path.exists(os.path.join(folder, second))
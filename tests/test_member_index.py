@@ -0,0 +1,39 @@
+"""
+Tests for member_index.py - reverse lookup from Director members to frames and clips.
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'build_scripts'))
+from member_index import build_index, merge_indexes
+
+
+def frame(dir_file, num, name, w=10, h=10):
+    return {'frame': {'x': 0, 'y': 0, 'w': w, 'h': h}, 'dirFile': dir_file, 'dirNum': num, 'dirName': name}
+
+
+class TestMemberIndex:
+
+    def test_frames_clips_and_aliases_are_indexed(self):
+        with tempfile.TemporaryDirectory() as folder:
+            with open(os.path.join(folder, 'a-sprites-0.json'), 'w') as fp:
+                # Frame 2 is a duplicate of frame 1 under another member
+                json.dump({'frames': {'1': frame('03.DXR', 33, 'door'), '2': frame('03.DXR', 34, 'door')}}, fp)
+            with open(os.path.join(folder, 'a-audio.json'), 'w') as fp:
+                json.dump({'spritemap': {'03e001v0': {'data': {'dirFile': '03.DXR', 'dirNum': 40,
+                                                               'dirName': '03e001v0'}}}}, fp)
+            index = build_index(folder, 'assets', [
+                {'type': 'atlasJSONHash', 'key': 'a-sprites-0', 'atlasURL': 'assets/a-sprites-0.json',
+                 'atlasData': None},
+                {'type': 'audiosprite', 'key': 'a-audio', 'jsonURL': 'assets/a-audio.json'},
+            ])
+        assert index['images']['03.DXR/33'] == [['a-sprites-0', '1', 10, 10]]
+        assert index['images']['03.DXR/34'] == [['a-sprites-0', '2', 10, 10]]
+        assert index['names']['door'] == ['03.DXR/33', '03.DXR/34']
+        assert index['sounds']['03.DXR/40'] == [['a-audio', '03e001v0']]
+
+        merged = merge_indexes({'a': index})
+        assert merged['images']['03.DXR/33'] == [['a', 'a-sprites-0', '1', 10, 10]]
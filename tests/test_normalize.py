@@ -0,0 +1,94 @@
+"""
+Tests for audiosprite/normalize.py - converting clips to the encoder rate once.
+"""
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+from pydub import AudioSegment
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from audiosprite import AudioSprite
+from audiosprite.normalize import normalize, resample_poly
+
+
+def sine(rate, seconds, freq=440, amplitude=0.5):
+    t = np.arange(int(rate * seconds)) / float(rate)
+    return np.sin(2 * np.pi * freq * t) * amplitude
+
+
+def segment(samples, rate, width=2):
+    scale = 2 ** (8 * width - 1) - 1
+    dtype = {1: np.int8, 2: '<i2'}[width]
+    data = np.round(samples * scale).astype(dtype).tobytes()
+    return AudioSegment(data=data, sample_width=width, frame_rate=rate, channels=1)
+
+
+class TestResample:
+
+    def test_sine_keeps_frequency_and_phase(self):
+        for rate, up, down in [(11025, 320, 147), (22050, 160, 147)]:
+            y = resample_poly(sine(rate, 1.0)[:, None], up, down)
+            assert len(y) == 24000
+            # the edges see the zero padding
+            expected = sine(24000, 1.0)
+            assert np.abs(y[200:-200, 0] - expected[200:-200]).max() < 1e-3
+
+    def test_removes_content_above_output_nyquist(self):
+        y = resample_poly(sine(48000, 1.0, freq=15000)[:, None], 1, 2)
+        assert np.abs(y[200:-200]).max() < 0.01
+
+
+class TestNormalize:
+
+    def test_8bit_to_16bit_at_rate(self):
+        seg = segment(sine(11025, 0.4), 11025, width=1)
+        data = normalize(seg, 24000, 1)
+        samples = np.frombuffer(data, dtype='<i2') / 32768.0
+        assert len(samples) == 9600
+        assert abs(np.abs(samples[100:-100]).max() - 0.5) < 0.01
+
+    def test_mono_to_stereo(self):
+        data = normalize(segment(sine(24000, 0.1), 24000), 24000, 2)
+        samples = np.frombuffer(data, dtype='<i2').reshape(-1, 2)
+        assert len(samples) == 2400
+        assert (samples[:, 0] == samples[:, 1]).all()
+
+    def test_cache(self):
+        seg = segment(sine(22050, 0.2), 22050)
+        with tempfile.TemporaryDirectory() as folder:
+            data = normalize(seg, 24000, 1, folder)
+            assert len(os.listdir(folder)) == 1
+            path = os.path.join(folder, os.listdir(folder)[0])
+            with open(path, 'wb') as fp:
+                fp.write(b'cached')
+            assert normalize(seg, 24000, 1, folder) == b'cached'
+            assert normalize(seg, 16000, 1, folder) != data
+            assert len(os.listdir(folder)) == 2
+
+
+class TestSpriteOutputRate:
+
+    def test_output_rate_of_formats(self):
+        assert AudioSprite.outputRate(['ogg'], ['-ar', '22050']) == 24000
+        assert AudioSprite.outputRate(['mp3'], ['-ar', '22050']) == 22050
+        assert AudioSprite.outputRate(['mp3']) is None
+
+    def test_clips_are_concatenated_at_output_rate(self):
+        with tempfile.TemporaryDirectory() as folder:
+            a = os.path.join(folder, 'a.wav')
+            b = os.path.join(folder, 'b.wav')
+            segment(sine(22050, 0.4), 22050).export(a, 'wav')
+            segment(sine(11025, 0.2), 11025, width=1).export(b, 'wav')
+            sprite = AudioSprite('test')
+            sprite.setOutputRate(24000)
+            sprite.addAudio(a)
+            sprite.addAudio(b)
+            out = sprite._concatenate()
+
+            assert (out.frame_rate, out.sample_width) == (24000, 2)
+            a, silence, b = sprite._files
+            assert (a['frames'], silence['frames'], b['frames']) == (9600, 24000, 4800)
+            assert sprite.duration() == 1.6
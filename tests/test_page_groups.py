@@ -0,0 +1,49 @@
+"""
+Tests for page_groups.py - keeping sprites used together on one atlas page.
+"""
+
+import os
+import sys
+import tempfile
+
+from PIL import Image
+from PyTexturePacker import ImageRect
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'build_scripts'))
+from page_groups import animation_groups, pack_grouped, pages_touched, scene_groups
+
+
+def make_rects(folder, count, size):
+    rects = []
+    for i in range(count):
+        path = os.path.join(folder, '%d.png' % i)
+        Image.new('RGBA', size, (i, 0, 0, 255)).save(path)
+        rect = ImageRect.ImageRect(path)
+        rect.dirFile = 'cast'
+        rect.dirNum = i + 1
+        rect.dupes = []
+        rects.append(rect)
+    return rects
+
+
+class TestPageGroups:
+
+    def test_animation_groups_offset_from_chart(self):
+        groups = animation_groups({'cast': {10: {'idle': [1, 2, 2], 'talk': [{'arguments': [[3, 4]]}]}}})
+        assert groups['animation:cast/10/idle'] == {('cast', 11), ('cast', 12)}
+        assert groups['animation:cast/10/talk'] == {('cast', 13), ('cast', 14)}
+
+    def test_scene_groups(self):
+        with tempfile.TemporaryDirectory() as folder:
+            with open(os.path.join(folder, 'yard.js'), 'w') as fp:
+                fp.write("a.setDirectorMember('10.DXR', 5)\nb.setDirectorMember(\"10.DXR\", 7)\n")
+            assert scene_groups(folder) == {'scene:yard.js': {('10.DXR', 5), ('10.DXR', 7)}}
+
+    def test_groups_stay_on_one_page(self):
+        with tempfile.TemporaryDirectory() as folder:
+            rects = make_rects(folder, 8, (200, 200))
+            # Interleaved so packing in member order would split both groups
+            groups = {'a': set(('cast', n) for n in [1, 3, 5, 7]), 'b': set(('cast', n) for n in [2, 4, 6, 8])}
+            packer, atlas_list = pack_grouped(rects, groups, 512, 0x00ffffff)
+            assert sum(len(atlas.image_rect_list) for atlas in atlas_list) == 8
+            assert pages_touched(groups, atlas_list) == 1
@@ -0,0 +1,46 @@
+"""
+Tests for palette_variants.py - finding bitmaps that only differ by palette.
+"""
+
+import os
+import sys
+import tempfile
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'build_scripts'))
+from palette_variants import find_palette_variants, variant_savings
+
+
+def make_bmp(folder, name, shift):
+    image = Image.new('P', (8, 4))
+    image.putdata([i % 7 for i in range(32)])
+    image.putpalette([(i + shift) % 256 for i in range(768)])
+    path = os.path.join(folder, name + '.bmp')
+    image.save(path)
+    return path
+
+
+def member(path, num):
+    return {'bmp': path, 'dirFile': 'boten_05.DXR', 'dirNum': num, 'width': 8, 'height': 4}
+
+
+class TestPaletteVariants:
+
+    def test_same_indices_with_other_palette_is_a_variant(self):
+        with tempfile.TemporaryDirectory() as folder:
+            summer = make_bmp(folder, 'summer', 0)
+            winter = make_bmp(folder, 'winter', 40)
+            resources = [{'name': 'a', 'images': [member(summer, 1), member(winter, 2)]},
+                         {'name': 'b', 'images': [member(summer, 1)]}]
+            groups = find_palette_variants(resources)
+        assert len(groups) == 1
+        assert groups[0]['palettes'] == 2
+        assert [m[:3] for m in groups[0]['members']] == [['a', 'boten_05.DXR', 1], ['a', 'boten_05.DXR', 2]]
+        assert variant_savings(groups[0]) == 2 * 8 * 4 * 4 - (8 * 4 + 2 * 1024)
+
+    def test_identical_palettes_are_not_variants(self):
+        with tempfile.TemporaryDirectory() as folder:
+            first = make_bmp(folder, 'first', 0)
+            second = make_bmp(folder, 'second', 0)
+            assert find_palette_variants([{'name': 'a', 'images': [member(first, 1), member(second, 2)]}]) == []
@@ -0,0 +1,49 @@
+"""
+Tests for png8.py - palettizing atlas pages.
+"""
+
+import io
+import os
+import sys
+
+import numpy as np
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'build_scripts'))
+from png8 import to_png8
+
+
+def page(colors, hidden, size=(64, 64), seed=1):
+    """Random page with the given numbers of visible and fully transparent colors."""
+    rnd = np.random.RandomState(seed)
+    visible = np.concatenate([rnd.randint(0, 255, (colors, 3)), np.full((colors, 1), 255)], axis=1)
+    transparent = np.concatenate([rnd.randint(0, 255, (hidden, 3)), np.zeros((hidden, 1))], axis=1)
+    table = np.concatenate([visible, transparent]).astype(np.uint8)
+    pixels = np.concatenate([np.arange(len(table)), rnd.randint(0, len(table), size[0] * size[1] - len(table))])
+    return Image.fromarray(table[pixels].reshape(size[1], size[0], 4), 'RGBA')
+
+
+def roundtrip(image):
+    out = io.BytesIO()
+    image.save(out, 'PNG')
+    return np.asarray(Image.open(io.BytesIO(out.getvalue())).convert('RGBA'))
+
+
+class TestPng8:
+
+    def test_exact_when_colors_fit(self):
+        image = page(200, 40)
+        indexed = to_png8(image)
+        assert indexed.mode == 'P'
+        assert np.array_equal(roundtrip(indexed), np.asarray(image))
+
+    def test_transparent_colors_are_merged_visible_kept(self):
+        image = page(250, 30)
+        original = np.asarray(image)
+        decoded = roundtrip(to_png8(image))
+        visible = original[..., 3] > 0
+        assert np.array_equal(decoded[visible], original[visible])
+        assert np.array_equal(decoded[..., 3], original[..., 3])
+
+    def test_too_many_colors_stay_rgba(self):
+        assert to_png8(page(300, 0)) is None
@@ -0,0 +1,67 @@
+"""
+Tests for png_optimize.py - lossless in-process recompression of atlas pages.
+"""
+
+import io
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pytest
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'build_scripts'))
+from png_optimize import encode_png, optimize_file
+
+
+def random_image(mode, size=(37, 23), seed=1):
+    rnd = np.random.RandomState(seed)
+    channels = {'RGBA': 4, 'RGB': 3}[mode]
+    # Blocky content so filters and zlib have something to find
+    small = rnd.randint(0, 255, (size[1] // 4 + 1, size[0] // 4 + 1, channels), dtype=np.uint8)
+    pixels = np.repeat(np.repeat(small, 4, axis=0), 4, axis=1)[:size[1], :size[0]]
+    return Image.fromarray(np.ascontiguousarray(pixels), mode)
+
+
+class TestEncodePng:
+
+    @pytest.mark.parametrize('mode', ['fast', 'max'])
+    def test_roundtrip_is_lossless(self, mode):
+        image = random_image('RGBA')
+        decoded = Image.open(io.BytesIO(encode_png(image, mode)))
+        assert np.array_equal(np.asarray(decoded.convert('RGBA')), np.asarray(image))
+
+    def test_opaque_rgba_is_stored_as_rgb(self):
+        image = random_image('RGB').convert('RGBA')
+        decoded = Image.open(io.BytesIO(encode_png(image)))
+        assert decoded.mode == 'RGB'
+        assert np.array_equal(np.asarray(decoded.convert('RGBA')), np.asarray(image))
+
+    def test_palette_transparency_is_kept(self):
+        image = Image.new('P', (16, 8))
+        image.putpalette([i % 256 for i in range(768)])
+        image.putdata([i % 5 for i in range(16 * 8)])
+        image.info['transparency'] = 2
+        decoded = Image.open(io.BytesIO(encode_png(image)))
+        assert decoded.mode == 'P'
+        assert np.array_equal(np.asarray(decoded.convert('RGBA')), np.asarray(image.convert('RGBA')))
+
+
+class TestOptimizeFile:
+
+    def test_second_run_comes_from_cache(self):
+        with tempfile.TemporaryDirectory() as folder:
+            cache = os.path.join(folder, 'cache')
+            first = os.path.join(folder, 'a.png')
+            second = os.path.join(folder, 'b.png')
+            random_image('RGBA').save(first, compress_level=0)
+            random_image('RGBA').save(second, compress_level=0)
+
+            path, before, after, cached = optimize_file(first, 'fast', cache)
+            assert not cached and after < before
+
+            path, before, after, cached = optimize_file(second, 'fast', cache)
+            assert cached
+            with open(first, 'rb') as a, open(second, 'rb') as b:
+                assert a.read() == b.read()
@@ -0,0 +1,32 @@
+"""
+Tests for progressive.py - choosing what goes into deferred packs.
+"""
+
+import json
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'build_scripts'))
+from progressive import (is_deferred_background, is_deferred_sound, load_marker_audio,
+                         load_score_backgrounds)
+
+
+class TestProgressive:
+
+    def test_marker_dialog_is_deferred(self):
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, 'marker_audio_map_boten_77.json')
+            with open(path, 'w') as fp:
+                json.dump({'dirFile': 'boten_77.DXR', 'markers': {'Leave': '77d002v0', 'NoTrip': None}}, fp)
+            marker_audio = load_marker_audio([path])
+        assert marker_audio == {('boten_77.DXR', '77d002v0')}
+        assert is_deferred_sound({'data': {'dirFile': 'boten_77.DXR', 'dirName': '77d002v0'}}, marker_audio)
+        assert not is_deferred_sound({'data': {'dirFile': 'boten_77.DXR', 'dirName': '77e001v0'}}, marker_audio)
+
+    def test_only_score_backgrounds_are_critical(self):
+        backgrounds = load_score_backgrounds()
+        assert 1 in backgrounds['85.DXR']
+        assert not is_deferred_background({'dirFile': '85.DXR', 'dirNum': 1}, backgrounds)
+        assert is_deferred_background({'dirFile': '85.DXR', 'dirNum': 999}, backgrounds)
+        assert not is_deferred_background({'dirFile': '10.DXR', 'dirNum': 999}, backgrounds)
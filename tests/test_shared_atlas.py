@@ -0,0 +1,62 @@
+"""
+Tests for shared_atlas.py - detecting sprites used by several resources.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'build_scripts'))
+from shared_atlas import find_shared_images, split_shared_images, pages_by_user, shared_savings
+
+
+def make_image(dir_file, num, content, opaque=False):
+    return {'dirFile': dir_file, 'dirNum': num, 'dirName': '%s_%d' % (dir_file, num), 'intName': str(num),
+            'contentHash': content, 'opaque': opaque, 'transparent_index_0': False,
+            'width': 10, 'height': 10}
+
+
+def make_resource(name, images, opaque=False):
+    return {'name': name, 'opaque': opaque, 'images': images, 'sounds': [], 'strings': {}, 'animations': {},
+            'files': []}
+
+
+class TestSharedImages:
+
+    def test_image_used_by_two_resources_is_shared(self):
+        a = make_resource('a', [make_image('00.CXT', 1, 'x'), make_image('01.DXR', 2, 'y')])
+        b = make_resource('b', [make_image('00.CXT', 1, 'x')])
+        shared = find_shared_images([a, b])
+        assert list(shared.values()) == [['a', 'b']]
+        assert shared_savings([a, b], shared) == 10 * 10 * 4
+
+    def test_conversion_flags_are_part_of_the_key(self):
+        a = make_resource('a', [make_image('00.CXT', 1, 'x')])
+        b = make_resource('b', [make_image('02.DXR', 1, 'x', opaque=True)])
+        assert len(find_shared_images([a, b])) == 0
+
+    def test_opaque_resources_are_not_shared(self):
+        a = make_resource('a', [make_image('00.CXT', 1, 'x')])
+        b = make_resource('b', [make_image('00.CXT', 1, 'x')], opaque=True)
+        assert len(find_shared_images([a, b])) == 0
+
+    def test_split_keeps_one_frame_per_member(self):
+        a = make_resource('a', [make_image('00.CXT', 1, 'x'), make_image('01.DXR', 2, 'y')])
+        b = make_resource('b', [make_image('00.CXT', 1, 'x'), make_image('03.DXR', 7, 'x')])
+        common = split_shared_images([a, b], find_shared_images([a, b]), 'common')
+
+        assert [i['dirNum'] for i in a['images']] == [2]
+        assert b['images'] == []
+        assert [(i['dirFile'], i['dirNum']) for i in common['images']] == [('00.CXT', 1), ('03.DXR', 7)]
+
+        pages = pages_by_user([(image, 'common-sprites-0') for image in common['images']])
+        assert pages == {'a': ['common-sprites-0'], 'b': ['common-sprites-0']}
+
+    def test_split_leaves_opaque_resources_alone(self):
+        a = make_resource('a', [make_image('00.CXT', 1, 'x')])
+        b = make_resource('b', [make_image('00.CXT', 1, 'x')])
+        opaque = make_resource('map', [make_image('00.CXT', 1, 'x')], opaque=True)
+        common = split_shared_images([a, b, opaque], find_shared_images([a, b, opaque]), 'common')
+
+        assert [(i['dirFile'], i['dirNum']) for i in opaque['images']] == [('00.CXT', 1)]
+        assert a['images'] == [] and b['images'] == []
+        assert common['images'][0]['users'] == ['a', 'b']
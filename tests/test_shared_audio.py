@@ -0,0 +1,47 @@
+"""
+Tests for shared_audio.py - encoding clips used by several resources once.
+"""
+
+import os
+import sys
+import tempfile
+import wave
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'build_scripts'))
+from shared_audio import duplicate_seconds, find_shared_sounds, split_shared_sounds
+
+
+def make_sound(folder, dir_file, name, value, frames=11025, loop=False):
+    path = os.path.join(folder, '%s-%s.wav' % (dir_file, name))
+    with wave.open(path, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(22050)
+        w.writeframes(bytes([value]) * frames * 2)
+    return {'path': path, 'loop': loop, 'contentHash': path,
+            'data': {'dirFile': dir_file, 'dirName': name, 'dirNum': value}}
+
+
+class TestSharedAudio:
+
+    def test_clips_are_matched_by_pcm(self):
+        with tempfile.TemporaryDirectory() as folder:
+            resources = [
+                {'name': 'menu', 'sounds': [make_sound(folder, '10.DXR', 'click', 1),
+                                            make_sound(folder, '10.DXR', 'intro', 2)]},
+                {'name': 'shared', 'sounds': [make_sound(folder, '00.CXT', 'ding', 1, loop=True)]},
+                {'name': 'yard', 'sounds': [make_sound(folder, '04.DXR', 'click', 1)]},
+            ]
+            shared = find_shared_sounds(resources)
+            assert len(shared) == 1
+            assert list(shared.values())[0]['users'] == ['menu', 'shared', 'yard']
+            assert duplicate_seconds(shared) == 1.0
+
+            common = split_shared_sounds(resources, shared, {'name': 'common', 'sounds': []})
+            assert [s['data']['dirName'] for s in resources[0]['sounds']] == ['intro']
+            assert resources[1]['sounds'] == [] and resources[2]['sounds'] == []
+            assert len(common['sounds']) == 1
+            # the yard member has the same dirName as the kept clip
+            assert common['sounds'][0]['aliases'] == [
+                {'data': {'dirFile': '00.CXT', 'dirName': 'ding', 'dirNum': 1}, 'loop': True}]
+            assert common['soundUsers'] == ['menu', 'shared', 'yard']
@@ -0,0 +1,43 @@
+"""
+Tests for tile_dedupe.py - estimating the savings of tile-deduplicated frames.
+"""
+
+import os
+import sys
+import tempfile
+
+from PIL import Image
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'build_scripts'))
+from tile_dedupe import resource_tiles
+
+
+class TestTileDedupe:
+
+    def test_shared_and_empty_tiles_are_counted_once(self):
+        with tempfile.TemporaryDirectory() as folder:
+            paths = []
+            for i in range(2):
+                # Same left half, different right half, empty bottom row of tiles
+                image = Image.new('RGBA', (64, 64), (0, 0, 0, 0))
+                image.paste((200, 10, 10, 255), (0, 0, 32, 32))
+                image.paste((10, 10 + i * 100, 10, 255), (32, 0, 64, 32))
+                paths.append(os.path.join(folder, '%d.png' % i))
+                image.save(paths[-1])
+            stats = resource_tiles(paths, 32)
+        assert stats['tiles'] == 8
+        assert stats['emptyTiles'] == 4
+        assert stats['uniqueTiles'] == 3
+        assert stats['saved'] == 2 * 64 * 64 - 3 * 32 * 32
+
+    def test_no_shared_tiles_saves_nothing(self):
+        with tempfile.TemporaryDirectory() as folder:
+            paths = []
+            for i in range(2):
+                # 40x40 frames take four padded 32x32 tiles each, none repeated
+                paths.append(os.path.join(folder, '%d.png' % i))
+                Image.new('RGBA', (40, 40), (i * 100, 10, 10, 255)).save(paths[-1])
+            stats = resource_tiles(paths, 32)
+        assert stats['uniqueTiles'] == 8
+        assert stats['tileArea'] > stats['area']
+        assert stats['saved'] == 0